@@ -7,7 +7,7 @@ from freemocap_utils.GUI_widgets.video_capture_widget import VideoCapture
 from freemocap_utils.GUI_widgets.NIH_widgets.frame_marking_widget import FrameMarker
 from freemocap_utils.GUI_widgets.NIH_widgets.saving_data_analysis_widget import SavingDataAnalysisWidget
 from freemocap_utils.GUI_widgets.NIH_widgets.balance_assessment_widget import BalanceAssessmentWidget
-from freemocap_utils.mediapipe_skeleton_builder import build_skeleton, mediapipe_connections, mediapipe_indices, qualisys_indices
+from freemocap_utils.mediapipe_skeleton_builder import build_skeleton_array, mediapipe_connections, mediapipe_indices, qualisys_indices
 
 from pathlib import Path
 
@@ -135,7 +135,7 @@ class MainWindow(QMainWindow):
     def build_mediapipe_skeleton(self, markers_to_use:list):
 
         #self.mediapipe_skeleton = build_skeleton(self.skel3d_data,mediapipe_indices,mediapipe_connections)
-        self.mediapipe_skeleton = build_skeleton(self.skel3d_data,markers_to_use,mediapipe_connections)
+        self.mediapipe_skeleton = build_skeleton_array(self.skel3d_data,markers_to_use,mediapipe_connections)
 
         self.num_frames = self.skel3d_data.shape[0]
         # self.reset_slider()
@@ -8,7 +8,7 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 
 def calculate_magnitude(point):
-    magnitude = np.sqrt((point[0])**2 + (point[1])**2 + (point[2])**2)
+    magnitude = np.linalg.norm(point, axis = -1)
     return magnitude
 
 #session_path = Path(r'D:\ValidationStudy_aaron\FreeMoCap_Data\sesh_2022-11-02_13_55_55_atc_nih_balance')
@@ -24,10 +24,7 @@ for system,path in zip(['freemocap', 'qualisys'],path_list):
     data_holder = freemocap_data_loader.FreeMoCapDataLoader(path)
     COM_data = data_holder.load_total_body_COM_data()
     velocity_COM = np.diff(COM_data, axis = 0)
-    speed_list = []
-    for x in range(velocity_COM.shape[0]):
-        speed = calculate_magnitude(velocity_COM[x])
-        speed_list.append(speed)
+    speed_list = np.linalg.norm(velocity_COM, axis = 1)
 
     eo_sg_range = [675,2325]
     ec_sg_range = [2725,4425]
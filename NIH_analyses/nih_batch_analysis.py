@@ -0,0 +1,119 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+from freemocap_utils.freemocap_data_loader import FreeMoCapDataLoader
+from freemocap_utils.GUI_widgets.NIH_widgets.path_length_tools.PathLengthCalculator import PathLengthCalculator
+
+CONDITION_DATA_JSON_NAME = 'condition_data.json'
+BATCH_METRICS_FILE_NAME = 'nih_batch_metrics.parquet'
+
+
+def find_condition_data_files(path_to_study_root:Path) -> list:
+    """ Every data_analysis/<analysis>/condition_data.json saved by the NIH GUI under the study root, in a stable order"""
+    return sorted(Path(path_to_study_root).glob(f'**/data_analysis/*/{CONDITION_DATA_JSON_NAME}'))
+
+
+def get_system_name(path_to_session_folder:Path) -> str:
+    #qualisys sessions are the ones with qualisys in the folder name, same as path_length_plots.py
+    return 'qualisys' if 'qualisys' in path_to_session_folder.name.lower() else 'freemocap'
+
+
+def get_trial_name(path_to_session_folder:Path) -> str:
+    """ Pulls 'TrialN' out of the session folder name, so FreeMoCap and Qualisys sessions of the same trial line up. Falls back to the folder name"""
+    trial_match = re.search(r'trial[\s_]*(\d+)', path_to_session_folder.name, flags=re.IGNORECASE)
+    return f'Trial{trial_match.group(1)}' if trial_match else path_to_session_folder.name
+
+
+def get_trial_sort_key(trial_name:str) -> tuple:
+    """ Sorts 'TrialN' names by their number, so Trial10 comes after Trial2. Names without a trial number go last, alphabetically"""
+    trial_match = re.fullmatch(r'Trial(\d+)', trial_name)
+    return (0, int(trial_match.group(1)), '') if trial_match else (1, 0, trial_name)
+
+
+def load_analysis(path_to_condition_json:Path) -> dict:
+    """ Load the condition frame intervals of one saved analysis, and the total body COM of its session"""
+    path_to_condition_json = Path(path_to_condition_json)
+    path_to_data_analysis = path_to_condition_json.parent
+    path_to_session_folder = path_to_data_analysis.parent.parent
+
+    with open(path_to_condition_json) as condition_json:
+        condition_data = json.load(condition_json)
+
+    return {
+        'session': path_to_session_folder.name,
+        'system': get_system_name(path_to_session_folder),
+        'trial': get_trial_name(path_to_session_folder),
+        'analysis': path_to_data_analysis.name,
+        'frame_intervals': condition_data['Frame Intervals'],
+        'com_data': FreeMoCapDataLoader(path_to_session_folder).load_total_body_COM_data(),
+    }
+
+
+def calculate_analysis_metrics(analysis:dict, sampling_rate:float = 30) -> pd.DataFrame:
+    """ Sway metrics (see calculate_sway_metrics) plus speed statistics for every condition of one loaded analysis, one row per condition.
+    Conditions are sliced the same way as the balance assessment in the NIH GUI, so path lengths match the saved condition_data.json"""
+    com_data = analysis['com_data']
+    analysis_metrics = PathLengthCalculator(com_data).get_sway_metrics(analysis['frame_intervals'], sampling_rate=sampling_rate)
+
+    frame_speeds = np.linalg.norm(np.diff(com_data, axis=0), axis=1)
+    analysis_metrics['median_speed'] = [
+        np.nanmedian(frame_speeds[start_frame:max(end_frame - 1, start_frame)]) if end_frame - start_frame > 1 else np.nan
+        for start_frame, end_frame in zip(analysis_metrics['start_frame'], analysis_metrics['end_frame'])
+    ]
+
+    analysis_metrics = analysis_metrics.reset_index()
+    for column_count, column_name in enumerate(['session', 'system', 'trial', 'analysis']):
+        analysis_metrics.insert(column_count, column_name, analysis[column_name])
+    return analysis_metrics
+
+
+def save_batch_metrics(batch_metrics:pd.DataFrame, path_to_output:Path):
+    """ Save to Parquet or Feather depending on the file extension"""
+    path_to_output = Path(path_to_output)
+    if path_to_output.suffix == '.parquet':
+        batch_metrics.to_parquet(path_to_output, index=False)
+    elif path_to_output.suffix == '.feather':
+        batch_metrics.to_feather(path_to_output)
+    else:
+        raise ValueError(f'Unsupported batch metrics file type {path_to_output.suffix}, use .parquet or .feather')
+
+
+def load_batch_metrics(path_to_batch_metrics:Path) -> pd.DataFrame:
+    """ Read the table written by run_batch_analysis, for the plotting scripts"""
+    path_to_batch_metrics = Path(path_to_batch_metrics)
+    if path_to_batch_metrics.suffix == '.feather':
+        return pd.read_feather(path_to_batch_metrics)
+    return pd.read_parquet(path_to_batch_metrics)
+
+
+def run_batch_analysis(path_to_study_root:Path, path_to_output:Path = None, num_workers:int = None, sampling_rate:float = 30) -> pd.DataFrame:
+    """ Find every saved NIH analysis under the study root, load the COM data with a thread pool (the loads are I/O bound)
+    and compute the per-condition metrics for every FreeMoCap and Qualisys session.
+    Everything goes into one table with a row per session/analysis/condition, saved to path_to_output
+    (study root/nih_batch_metrics.parquet by default, or .feather)"""
+    path_to_study_root = Path(path_to_study_root)
+    if path_to_output is None:
+        path_to_output = path_to_study_root/BATCH_METRICS_FILE_NAME
+
+    condition_data_files = find_condition_data_files(path_to_study_root)
+    if not condition_data_files:
+        raise FileNotFoundError(f'No data_analysis/*/{CONDITION_DATA_JSON_NAME} files found under {path_to_study_root}')
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        loaded_analyses = list(executor.map(load_analysis, condition_data_files))
+
+    batch_metrics = pd.concat([calculate_analysis_metrics(analysis, sampling_rate=sampling_rate) for analysis in loaded_analyses], ignore_index=True)
+    save_batch_metrics(batch_metrics, path_to_output)
+    return batch_metrics
+
+
+if __name__ == '__main__':
+    path_to_study_root = Path(r'D:\2023-05-17_MDN_NIH_data\1.0_recordings\calib_3')
+
+    batch_metrics = run_batch_analysis(path_to_study_root)
+    print(batch_metrics)
@@ -5,33 +5,20 @@ import numpy as np
 from pathlib import Path
 import seaborn as sns
 
-# Helper function to aggregate path lengths
-def aggregate_path_lengths(analysis_folder):
-    json_path = analysis_folder / 'condition_data.json'
-    
-    # Check if JSON file exists
-    if not json_path.exists():
-        print(f"JSON file not found in {analysis_folder}.")
-        return {}
-
-    # Read the JSON data
-    json_data = json.load(open(json_path))
+from NIH_analyses.nih_batch_analysis import BATCH_METRICS_FILE_NAME, get_trial_sort_key, load_batch_metrics, run_batch_analysis
 
-    # Extract path lengths
-    return json_data.get('Path Lengths:', {})
+# Path lengths come from the batch metrics table, which is built once for the whole study (see nih_batch_analysis.py)
+path_to_study_root = Path(r'D:\2023-05-17_MDN_NIH_data\1.0_recordings\calib_3')
+path_to_batch_metrics = path_to_study_root / BATCH_METRICS_FILE_NAME
 
-# Analysis folders for each trial
-analysis_folders_freemocap = [
-    Path(r'D:\2023-05-17_MDN_NIH_data\1.0_recordings\calib_3\sesh_2023-05-17_14_40_56_MDN_NIH_Trial2\data_analysis\analysis_2023-06-01_10_03_59'),
-    Path(r'D:\2023-05-17_MDN_NIH_data\1.0_recordings\calib_3\sesh_2023-05-17_14_53_48_MDN_NIH_Trial3\data_analysis\analysis_2023-06-01_10_12_24'),
-    Path(r'D:\2023-05-17_MDN_NIH_data\1.0_recordings\calib_3\sesh_2023-05-17_15_03_20_MDN_NIH_Trial4\data_analysis\analysis_2023-06-01_10_17_22'),
-]
+if path_to_batch_metrics.exists():
+    batch_metrics = load_batch_metrics(path_to_batch_metrics)
+else:
+    batch_metrics = run_batch_analysis(path_to_study_root, path_to_batch_metrics)
 
-analysis_folders_qualisys = [
-    Path(r'D:\2023-05-17_MDN_NIH_data\1.0_recordings\calib_3\qualisys_MDN_NIH_Trial2\data_analysis\analysis_2023-06-01_16_11_00'),
-    Path(r'D:\2023-05-17_MDN_NIH_data\1.0_recordings\calib_3\qualisys_MDN_NIH_Trial3\data_analysis\analysis_2023-06-01_17_14_40'),
-    Path(r'D:\2023-05-17_MDN_NIH_data\1.0_recordings\calib_3\qualisys_MDN_NIH_Trial4\data_analysis\analysis_2023-06-01_18_06_59')
-]
+# If a session was analyzed more than once, use its latest analysis
+batch_metrics = batch_metrics.sort_values('analysis', kind='stable').drop_duplicates(subset=['session', 'condition'], keep='last')
+trials = sorted(batch_metrics['trial'].unique(), key=get_trial_sort_key)
 
 # Variables for plotting
 colors = ['#4d7197', '#bf6431']
@@ -39,20 +26,21 @@ labels = ['FreeMoCap', 'Qualisys']
 bar_width = 0.35
 sns.set_style('whitegrid')
 # Loop through each trial
-fig, axes = plt.subplots(nrows=1, ncols=3, figsize=(18, 6), sharey=True)
+fig, axes = plt.subplots(nrows=1, ncols=len(trials), figsize=(6 * len(trials), 6), sharey=True, squeeze=False)
 
 # Loop through each trial
-for i, (folder_freemocap, folder_qualisys, ax) in enumerate(zip(analysis_folders_freemocap, analysis_folders_qualisys, axes)):
+for i, (trial, ax) in enumerate(zip(trials, axes[0])):
     
     # Get path lengths
-    path_lengths_freemocap = aggregate_path_lengths(Path(folder_freemocap))
-    path_lengths_qualisys = aggregate_path_lengths(Path(folder_qualisys))
-    conditions = list(path_lengths_freemocap.keys())
+    trial_metrics = batch_metrics[batch_metrics['trial'] == trial]
+    conditions = list(dict.fromkeys(trial_metrics['condition']))
     x = np.arange(len(conditions))  # the label locations
     
     # Data for plotting
-    data_freemocap = list(path_lengths_freemocap.values())
-    data_qualisys = list(path_lengths_qualisys.values())
+    data_freemocap, data_qualisys = [
+        trial_metrics[trial_metrics['system'] == system].set_index('condition')['normalized_path_length'].reindex(conditions).to_numpy()
+        for system in ['freemocap', 'qualisys']
+    ]
 
     # Plot bars with path length values
     for j, data in enumerate([data_freemocap, data_qualisys]):
@@ -66,7 +54,7 @@ for i, (folder_freemocap, folder_qualisys, ax) in enumerate(zip(analysis_folders
     ax.set_xlabel('Condition', fontsize=12, fontweight='bold')
     if i == 0:
         ax.set_ylabel('Path Length (mm)', fontsize=12, fontweight='bold')
-    ax.set_title(f'Trial {i + 1} Path Length Comparison', fontsize=14, fontweight='bold')
+    ax.set_title(f'{trial} Path Length Comparison', fontsize=14, fontweight='bold')
     # plt.xticks(rotation=10)
 
 # Add a single legend for the entire figure
@@ -3,6 +3,7 @@ import numpy as np
 
 from freemocap_utils.mediapipe_skeleton_builder import mediapipe_indices
 from freemocap_utils.qualisys_indices import qualisys_indices
+from freemocap_utils.rmse_calculation import get_marker_correspondence, calculate_rmse_array, rmse_array_to_dataframe
 
 import pandas as pd
 
@@ -25,26 +26,11 @@ def get_rmse_dataframe(qualisys_data:np.ndarray, freemocap_data:np.ndarray, fram
     qualisys_data = qualisys_data[start_frame:end_frame,:,:] - qualisys_data[start_frame,:,:]
     freemocap_data = freemocap_data[start_frame:end_frame,:,:] - freemocap_data[start_frame,:,:]
 
-    rmse_dataframe = pd.DataFrame()
+    #only run rmse on the markers that are in both qualisys and freemocap
+    marker_correspondence = get_marker_correspondence(mediapipe_indices, qualisys_indices)
+    rmse_array = calculate_rmse_array(qualisys_data, freemocap_data, marker_correspondence)
 
-    dimension_list = ['x','y','z']
-
-    for marker_name in mediapipe_indices:
-        if marker_name in qualisys_indices: #only run rmse if the marker is in both qualisys and freemocap
-            mediapipe_marker_index = mediapipe_indices.index(marker_name)
-            qualisys_marker_index = qualisys_indices.index(marker_name)
-
-            rmse_list = []
-            
-            for dimension_count,dimension in enumerate(dimension_list):
-                rmse = calculate_rmse(qualisys_data[:,qualisys_marker_index,dimension_count],freemocap_data[:,mediapipe_marker_index,dimension_count])
-                
-                rmse_list.append(rmse) #add rmse per dimension to a list 
-
-            rmse_dict = {'marker': marker_name, 'rmse': rmse_list, 'dimension': dimension_list}
-            rmse_dataframe = pd.concat([pd.DataFrame(rmse_dict),rmse_dataframe])
-    
-    return rmse_dataframe
+    return rmse_array_to_dataframe(rmse_array, marker_correspondence.marker_names)
 
 
 def plot_time_series(qualisys_data:np.ndarray, freemocap_data:np.ndarray, frames_to_plot:list):
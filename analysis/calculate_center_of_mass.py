@@ -1,5 +1,6 @@
 import logging
-from typing import List
+from pathlib import Path
+from typing import List, Union
 
 import numpy as np
 import pandas as pd
@@ -187,6 +188,65 @@ def build_mediapipe_skeleton(mediapipe_pose_data, segment_dataframe, mediapipe_i
     return mediapipe_frame_segment_joint_XYZ
 
 
+def build_segment_index_arrays(segment_dataframe, mediapipe_indices):
+    """Resolves the proximal and distal joints of every segment in the segment_dataframe to
+    indices into the mediapipe_pose_data array, once, rather than once per frame.
+
+    Each end of a segment is described by a pair of marker indices whose midpoint is the joint
+    position. For most segments both indices of the pair are the same marker; for the trunk they
+    are the shoulders (proximal) and the hips (distal), which matches build_virtual_trunk_marker.
+    The hand and foot substitutions are the same ones made in build_mediapipe_skeleton.
+
+    Returns:
+        proximal_indices: (segments, 2) int array
+        distal_indices: (segments, 2) int array
+    """
+    num_segments = len(segment_dataframe)
+    proximal_indices = np.empty((num_segments, 2), dtype=np.intp)
+    distal_indices = np.empty((num_segments, 2), dtype=np.intp)
+
+    for segment_count, (segment, segment_info) in enumerate(segment_dataframe.iterrows()):
+        if segment == "trunk":
+            proximal_joint_names = ["left_shoulder", "right_shoulder"]
+            distal_joint_names = ["left_hip", "right_hip"]
+        elif segment == "left_hand" or segment == "right_hand":
+            proximal_joint_names = [segment_info["Joint_Connection"][0]] * 2
+            distal_joint_names = ["left_index" if segment == "left_hand" else "right_index"] * 2
+        elif segment == "left_foot" or segment == "right_foot":
+            proximal_joint_names = ["left_ankle" if segment == "left_foot" else "right_ankle"] * 2
+            distal_joint_names = [segment_info["Joint_Connection"][1]] * 2
+        else:
+            proximal_joint_names = [segment_info["Joint_Connection"][0]] * 2
+            distal_joint_names = [segment_info["Joint_Connection"][1]] * 2
+
+        proximal_indices[segment_count] = return_indices_of_joints(mediapipe_indices, proximal_joint_names)
+        distal_indices[segment_count] = return_indices_of_joints(mediapipe_indices, distal_joint_names)
+
+    return proximal_indices, distal_indices
+
+
+def build_mediapipe_skeleton_array(mediapipe_pose_data, segment_dataframe, mediapipe_indices) -> np.ndarray:
+    """Array-native version of build_mediapipe_skeleton. Instead of a list of per-frame dictionaries,
+    this returns a single (frames, segments, 2, 3) array where [:, :, 0, :] holds the proximal joint
+    and [:, :, 1, :] holds the distal joint of each segment, in the row order of the segment_dataframe.
+    The whole recording is gathered at once with fancy indexing."""
+
+    proximal_indices, distal_indices = build_segment_index_arrays(segment_dataframe, mediapipe_indices)
+
+    num_frames = mediapipe_pose_data.shape[0]
+    num_segments = proximal_indices.shape[0]
+    mediapipe_frame_segment_joint_XYZ = np.empty((num_frames, num_segments, 2, 3), dtype=np.float64)
+
+    mediapipe_frame_segment_joint_XYZ[:, :, 0, :] = (
+        mediapipe_pose_data[:, proximal_indices[:, 0], :] + mediapipe_pose_data[:, proximal_indices[:, 1], :]
+    ) / 2
+    mediapipe_frame_segment_joint_XYZ[:, :, 1, :] = (
+        mediapipe_pose_data[:, distal_indices[:, 0], :] + mediapipe_pose_data[:, distal_indices[:, 1], :]
+    ) / 2
+
+    return mediapipe_frame_segment_joint_XYZ
+
+
 # %%
 # values for segment weight and segment mass percentages taken from Winter anthropometry tables
 # https://imgur.com/a/aD74j
@@ -378,7 +438,35 @@ def calculate_center_of_mass(
     )
 
 
-def run_center_of_mass_calculations(processed_skel3d_frame_marker_xyz: np.ndarray):
+def calculate_center_of_mass_from_skeleton_array(
+    skeleton_frame_segment_joint_XYZ: np.ndarray,
+    anthropometric_info_dataframe: pd.DataFrame,
+):
+    """Takes the (frames, segments, 2, 3) array from build_mediapipe_skeleton_array and calculates the
+    segment and total body center of mass for every frame at once. Gives the same results as
+    calculate_center_of_mass without building any per-frame dictionaries."""
+    segment_COM_lengths = anthropometric_info_dataframe["Segment_COM_Length"].to_numpy(dtype=np.float64)
+    segment_COM_percentages = anthropometric_info_dataframe["Segment_COM_Percentage"].to_numpy(dtype=np.float64)
+
+    segment_proximal = skeleton_frame_segment_joint_XYZ[:, :, 0, :]
+    segment_distal = skeleton_frame_segment_joint_XYZ[:, :, 1, :]
+
+    segment_COM_frame_imgPoint_XYZ = segment_proximal + segment_COM_lengths[None, :, None] * (
+        segment_distal - segment_proximal
+    )
+    totalBodyCOM_frame_XYZ = np.nansum(
+        segment_COM_frame_imgPoint_XYZ * segment_COM_percentages[None, :, None], axis=1
+    )
+
+    return segment_COM_frame_imgPoint_XYZ, totalBodyCOM_frame_XYZ
+
+
+def run_center_of_mass_calculations(processed_skel3d_frame_marker_xyz: np.ndarray, use_skeleton_array: bool = True):
+    """Calculates segment and total body center of mass for a (frames, markers, 3) mediapipe array.
+
+    With use_skeleton_array (the default) the skeleton is built as one (frames, segments, 2, 3) array
+    and the center of mass is calculated on the whole recording at once. Set it to False to use the
+    original frame-by-frame dictionary path."""
     anthropometric_info_dataframe = build_anthropometric_dataframe(
         BODY_SEGMENT_NAMES, joint_connections, segment_COM_lengths, segment_COM_percentages
     )
@@ -387,6 +475,16 @@ def run_center_of_mass_calculations(processed_skel3d_frame_marker_xyz: np.ndarra
             "Mediapipe body landmark names do not match expected names - Perhaps they altered the names in a new version? This code will need to be updated"
         )
 
+    if use_skeleton_array:
+        skeleton_frame_segment_joint_XYZ = build_mediapipe_skeleton_array(
+            processed_skel3d_frame_marker_xyz,
+            anthropometric_info_dataframe,
+            mediapipe_body_landmark_names,
+        )
+        return calculate_center_of_mass_from_skeleton_array(
+            skeleton_frame_segment_joint_XYZ, anthropometric_info_dataframe
+        )
+
     skelcoordinates_frame_segment_joint_XYZ = build_mediapipe_skeleton(
         processed_skel3d_frame_marker_xyz,
         anthropometric_info_dataframe,
@@ -403,3 +501,61 @@ def run_center_of_mass_calculations(processed_skel3d_frame_marker_xyz: np.ndarra
     )
 
     return segment_COM_frame_imgPoint_XYZ, totalBodyCOM_frame_XYZ
+
+
+DEFAULT_CENTER_OF_MASS_CHUNK_SIZE = 10000
+
+
+def run_chunked_center_of_mass_calculations(
+    path_to_skeleton_npy: Union[str, Path],
+    path_to_segment_COM_npy: Union[str, Path],
+    path_to_total_body_COM_npy: Union[str, Path],
+    chunk_size: int = DEFAULT_CENTER_OF_MASS_CHUNK_SIZE,
+):
+    """Streaming version of run_center_of_mass_calculations for recordings too big to hold in memory.
+
+    The (frames, markers, 3) skeleton .npy is memory-mapped rather than loaded, and walked chunk_size frames
+    at a time. The segment and total body center of mass for each chunk are written straight into .npy files
+    preallocated with np.lib.format.open_memmap, so peak memory depends on chunk_size, not the recording length.
+    The results are the same as run_center_of_mass_calculations, since every frame is calculated independently.
+
+    Returns the (read-only) memory-mapped segment and total body center of mass arrays."""
+    anthropometric_info_dataframe = build_anthropometric_dataframe(
+        BODY_SEGMENT_NAMES, joint_connections, segment_COM_lengths, segment_COM_percentages
+    )
+    if not mediapipe_body_names_match_expected(mediapipe_body_landmark_names):
+        raise ValueError(
+            "Mediapipe body landmark names do not match expected names - Perhaps they altered the names in a new version? This code will need to be updated"
+        )
+
+    skeleton_frame_marker_xyz = np.load(path_to_skeleton_npy, mmap_mode="r")
+    num_frames = skeleton_frame_marker_xyz.shape[0]
+    num_segments = len(anthropometric_info_dataframe)
+
+    for path_to_output in (path_to_segment_COM_npy, path_to_total_body_COM_npy):
+        Path(path_to_output).parent.mkdir(parents=True, exist_ok=True)
+
+    segment_COM_frame_imgPoint_XYZ = np.lib.format.open_memmap(
+        path_to_segment_COM_npy, mode="w+", dtype=np.float64, shape=(num_frames, num_segments, 3)
+    )
+    totalBodyCOM_frame_XYZ = np.lib.format.open_memmap(
+        path_to_total_body_COM_npy, mode="w+", dtype=np.float64, shape=(num_frames, 3)
+    )
+
+    for chunk_start in track(range(0, num_frames, chunk_size), description="Calculating Center of Mass in chunks"):
+        chunk_end = min(chunk_start + chunk_size, num_frames)
+        skeleton_frame_segment_joint_XYZ = build_mediapipe_skeleton_array(
+            skeleton_frame_marker_xyz[chunk_start:chunk_end],
+            anthropometric_info_dataframe,
+            mediapipe_body_landmark_names,
+        )
+        (
+            segment_COM_frame_imgPoint_XYZ[chunk_start:chunk_end],
+            totalBodyCOM_frame_XYZ[chunk_start:chunk_end],
+        ) = calculate_center_of_mass_from_skeleton_array(skeleton_frame_segment_joint_XYZ, anthropometric_info_dataframe)
+
+    segment_COM_frame_imgPoint_XYZ.flush()
+    totalBodyCOM_frame_XYZ.flush()
+    del segment_COM_frame_imgPoint_XYZ, totalBodyCOM_frame_XYZ
+
+    return np.load(path_to_segment_COM_npy, mmap_mode="r"), np.load(path_to_total_body_COM_npy, mmap_mode="r")
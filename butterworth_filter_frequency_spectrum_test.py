@@ -1,4 +1,4 @@
-from skellyforge.freemocap_utils.postprocessing_widgets.postprocessing_functions.filter_data import butter_lowpass_filter, filter_skeleton_data
+from freemocap_utils.skeleton_filtering import butter_lowpass_filter, filter_skeleton_data
 
 import numpy as np
 import matplotlib.pyplot as plt
@@ -127,14 +127,6 @@ from scipy.stats import linregress
 from pathlib import Path
 from freemocap_utils.mediapipe_skeleton_builder import mediapipe_indices
 
-# Butterworth filter function
-def butter_lowpass_filter(data, cutoff, sampling_rate, order):
-    nyquist_freq = 0.5 * sampling_rate
-    normal_cutoff = cutoff / nyquist_freq
-    b, a = signal.butter(order, normal_cutoff, btype='low', analog=False)
-    y = signal.filtfilt(b, a, data)
-    return y
-
 # Compute RMSE of second derivatives (accelerations)
 def compute_rmse(original_data, filtered_data):
     return np.sqrt(np.mean((original_data - filtered_data) ** 2))
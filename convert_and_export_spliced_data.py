@@ -2,7 +2,7 @@ import numpy as np
 from pathlib import Path
 from analysis.calculate_center_of_mass import run_center_of_mass_calculations
 from export.convert_mediapipe_npy_to_csv import convert_mediapipe_npy_to_csv
-from typing import Union
+from typing import Optional, Union
 import pandas as pd
 
 from freemocap.core_processes.post_process_skeleton_data.estimate_skeleton_segment_lengths import (
@@ -34,7 +34,9 @@ def save_skeleton_array_to_npy(
     )
 
 
-def split_and_export_data(skel3d_frame_marker_xyz, path_to_recording_folder, path_to_folder_where_we_will_save_this_data):
+def split_and_export_data(skel3d_frame_marker_xyz, path_to_recording_folder, path_to_folder_where_we_will_save_this_data, columnar_format: Optional[str] = None):
+    #columnar_format ('parquet' or 'arrow') also saves the body/hands/face tables in that format (float64, so nothing changes downstream),
+    #next to the csvs, and the body data for the segment lengths is read back from its table instead of parsing the csv
     path_to_folder_where_we_will_save_this_data.mkdir(parents=True, exist_ok=True)
     save_skeleton_array_to_npy(
         array_to_save=skel3d_frame_marker_xyz,
@@ -66,12 +68,19 @@ def split_and_export_data(skel3d_frame_marker_xyz, path_to_recording_folder, pat
     convert_mediapipe_npy_to_csv(
         mediapipe_3d_frame_trackedPoint_xyz=skel3d_frame_marker_xyz,
         output_data_folder_path=path_to_folder_where_we_will_save_this_data,
+        columnar_format=columnar_format,
+        columnar_dtype=np.float64,
     )
 
     path_to_skeleton_body_csv = (
         path_to_folder_where_we_will_save_this_data / MEDIAPIPE_BODY_3D_DATAFRAME_CSV_FILE_NAME
     )
-    skeleton_dataframe = pd.read_csv(path_to_skeleton_body_csv)
+    if columnar_format is not None:
+        from export.columnar_export import get_columnar_path, load_part_dataframe
+
+        skeleton_dataframe = load_part_dataframe(get_columnar_path(path_to_skeleton_body_csv, columnar_format))
+    else:
+        skeleton_dataframe = pd.read_csv(path_to_skeleton_body_csv)
 
     skeleton_segment_lengths_dict = estimate_skeleton_segment_lengths(
         skeleton_dataframe=skeleton_dataframe,
@@ -1,8 +1,13 @@
 from pathlib import Path
+import json
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 # from compile_dlc_csvs import compile_dlc_csvs
 # from reconstruct_dlc_data import reconstruct_dlc_data
 # from splice_3d_data import splice_freemocap_and_dlc_leg_data
 from convert_and_export_spliced_data import split_and_export_data
+from task_cache import TaskCache, hash_array, hash_settings, hash_task, DEFAULT_MAX_CACHE_SIZE_BYTES
 import numpy as np
 
 from skellyforge.freemocap_utils.postprocessing_widgets.task_worker_thread import TaskWorkerThread
@@ -29,20 +34,35 @@ SAVE_CONFIG = {
     TASK_SPLICE_3D_DATA: 'mediapipe_deeplabcut_3dData_spliced',
 }
 
+#tasks whose results are only their returned array, so they can be loaded from the cache instead of rerun.
+#compiling and reconstructing the DLC data read the DeepLabCut csvs on disk, which aren't part of the input hash,
+#so they always rerun, and the tasks after them are keyed on their actual result (see run)
+CACHEABLE_TASKS = [
+    TASK_SPLICE_3D_DATA,
+    TASK_POSTPROCESS_DATA,
+]
+
 class DLCDataWorker:
 
-    def __init__(self, path_to_recording_folder, path_to_calibration_toml, path_to_freemocap_data, task_list=[]):
+    def __init__(self, path_to_recording_folder, path_to_calibration_toml, path_to_freemocap_data, task_list=[], use_cache=True, max_cache_size_bytes=DEFAULT_MAX_CACHE_SIZE_BYTES):
         self.path_to_recording_folder = path_to_recording_folder
         self.path_to_calibration_toml = path_to_calibration_toml
         self.path_to_freemocap_data = path_to_freemocap_data
         self.freemocap_data = np.load(self.path_to_freemocap_data)
+
+        self.use_cache = use_cache
+        self.task_cache = TaskCache(Path(self.path_to_recording_folder)/'output_data'/'.cache', max_cache_size_bytes=max_cache_size_bytes)
+        self.task_settings = {
+            TASK_POSTPROCESS_DATA: default_settings,
+        }
         
         self.available_tasks = {
             TASK_POSTPROCESS_DATA: self.post_process_data,
             TASK_SPLIT_AND_EXPORT: self.split_and_export_data
         }
 
-        self.tasks = {task_name: {'function': self.available_tasks[task_name], 'result': None} for task_name in task_list}
+        self.tasks = {task_name: {'function': self.available_tasks[task_name], 'result': None, 'hash': None, 'loaded_from_cache': False} for task_name in task_list}
+        self.task_timings = {}
 
     
     def post_process_data(self):
@@ -68,29 +88,143 @@ class DLCDataWorker:
         np.save(save_path, data)
 
 
+    def get_input_hash(self):
+        """Everything outside the task chain that the results depend on: the freemocap data and the calibration file"""
+        calibration_toml = Path(self.path_to_calibration_toml)
+        calibration_hash = hash_settings(calibration_toml.read_text()) if calibration_toml.is_file() else ''
+        return hash_task('inputs', hash_array(self.freemocap_data), settings_hash=calibration_hash)
+
     def run(self):
+        input_hash = self.get_input_hash() if self.use_cache else ''
+        upstream_task_hash = ''
+
         for task_name, task_info in self.tasks.items():
-            task_info['result'] = task_info['function']()
+            task_start_time = time.perf_counter()
+
+            task_info['hash'] = hash_task(task_name, input_hash, upstream_task_hash, hash_settings(self.task_settings.get(task_name)))
+
+            cached_result = None
+            if self.use_cache and task_name in CACHEABLE_TASKS:
+                cached_result = self.task_cache.load(task_info['hash'])
+
+            if cached_result is not None:
+                task_info['result'] = cached_result
+                task_info['loaded_from_cache'] = True
+            else:
+                task_info['result'] = task_info['function']()
+                if self.use_cache and task_name in CACHEABLE_TASKS and isinstance(task_info['result'], np.ndarray):
+                    self.task_cache.save(task_info['hash'], task_info['result'])
+
+            if self.use_cache and task_name not in CACHEABLE_TASKS and isinstance(task_info['result'], np.ndarray):
+                #this task depends on files outside the input hash, so the tasks after it are keyed on what it actually returned
+                upstream_task_hash = hash_task(task_name, hash_array(task_info['result']))
+            else:
+                upstream_task_hash = task_info['hash']
+
+            self.task_timings[task_name] = time.perf_counter() - task_start_time
 
             if task_name in SAVE_CONFIG:
                 self.save_to_npy(task_name, task_info['result'])
 
 
-def process_session_folder(session_folder_path, calibration_toml_path, tasks_to_run):
+def get_output_file_modification_times(path_to_output_folder):
+    """Returns the modification time of every file in the output folder, so we can tell which files a run wrote"""
+    if not path_to_output_folder.exists():
+        return {}
+    return {str(path): path.stat().st_mtime for path in path_to_output_folder.rglob('*') if path.is_file()}
+
+
+def process_recording_folder(recording_folder, calibration_toml, path_to_freemocap_data, tasks_to_run):
+    """Runs a DLCDataWorker on one recording and returns its manifest entry. Any error is caught and recorded in the entry
+    instead of being raised, so one bad recording doesn't stop the rest of the session"""
+    path_to_output_folder = recording_folder/'output_data'
+    output_files_before_run = get_output_file_modification_times(path_to_output_folder)
+
+    manifest_entry = {
+        'recording_folder': str(recording_folder),
+        'status': 'success',
+        'elapsed_seconds': None,
+        'task_timings': {},
+        'outputs': [],
+        'error': None,
+    }
+
+    start_time = time.perf_counter()
+    worker = None
+    try:
+        worker = DLCDataWorker(recording_folder, calibration_toml, path_to_freemocap_data, tasks_to_run)
+        worker.run()
+    except Exception:
+        manifest_entry['status'] = 'failed'
+        manifest_entry['error'] = traceback.format_exc()
+
+    manifest_entry['elapsed_seconds'] = time.perf_counter() - start_time
+    if worker is not None:
+        manifest_entry['task_timings'] = worker.task_timings
+
+    output_files_after_run = get_output_file_modification_times(path_to_output_folder)
+    manifest_entry['outputs'] = sorted(path for path, modification_time in output_files_after_run.items() if output_files_before_run.get(path) != modification_time)
+
+    return manifest_entry
+
+
+def process_session_folder(session_folder_path, calibration_toml_path, tasks_to_run, num_workers=1, path_to_manifest=None):
+    """Runs the pipeline on every recording folder in the session folder. With num_workers > 1 the recordings are processed in parallel
+    in a process pool. A manifest with the timings, outputs and errors for each recording is saved as json (by default to
+    'pipeline_manifest.json' in the session folder) and returned"""
     session_folder = Path(session_folder_path)
     calibration_toml = Path(calibration_toml_path)
-    
+
+    recordings_to_process = []
     # Iterate through each recording folder in the session folder
-    for recording_folder in session_folder.iterdir():
+    for recording_folder in sorted(session_folder.iterdir()):
         if recording_folder.is_dir():
             path_to_freemocap_data = recording_folder/'output_data'/'raw_data'/'mediapipe3dData_numFrames_numTrackedPoints_spatialXYZ.npy'
             if path_to_freemocap_data.exists():  # Only proceed if the required data file exists
-                worker = DLCDataWorker(recording_folder, calibration_toml, path_to_freemocap_data, tasks_to_run)
-                worker.run()
+                recordings_to_process.append((recording_folder, calibration_toml, path_to_freemocap_data, tasks_to_run))
+
+    session_start_time = time.perf_counter()
+    if num_workers <= 1:
+        manifest_entries = [process_recording_folder(*recording) for recording in recordings_to_process]
+    else:
+        manifest_entries = []
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            future_to_recording_folder = {executor.submit(process_recording_folder, *recording): recording[0] for recording in recordings_to_process}
+            for future in as_completed(future_to_recording_folder):
+                try:
+                    manifest_entries.append(future.result())
+                except Exception:
+                    # the worker process itself died, so there is no entry from it
+                    manifest_entries.append({
+                        'recording_folder': str(future_to_recording_folder[future]),
+                        'status': 'failed',
+                        'elapsed_seconds': None,
+                        'task_timings': {},
+                        'outputs': [],
+                        'error': traceback.format_exc(),
+                    })
+        manifest_entries.sort(key=lambda entry: entry['recording_folder'])
+
+    manifest = {
+        'session_folder': str(session_folder),
+        'tasks': list(tasks_to_run),
+        'num_workers': num_workers,
+        'elapsed_seconds': time.perf_counter() - session_start_time,
+        'num_recordings': len(manifest_entries),
+        'num_failed': sum(entry['status'] == 'failed' for entry in manifest_entries),
+        'recordings': manifest_entries,
+    }
+
+    if path_to_manifest is None:
+        path_to_manifest = session_folder/'pipeline_manifest.json'
+    with open(path_to_manifest, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
+
+    return manifest
 
 if __name__ == '__main__':
     session_folder_path = r'D:\2023-06-07_JH\1.0_recordings\treadmill_calib'
     calibration_toml_path = r'D:\2023-06-07_JH\1.0_recordings\sesh_2023-06-07_11_10_50_treadmill_calibration_01\sesh_2023-06-07_11_10_50_treadmill_calibration_01_camera_calibration.toml'
     tasks_to_run = [TASK_COMPILE_CSVS, TASK_RECONSTRUCT_DLC_DATA, TASK_SPLICE_3D_DATA, TASK_POSTPROCESS_DATA, TASK_SPLIT_AND_EXPORT]
-    process_session_folder(session_folder_path, calibration_toml_path, tasks_to_run)
+    process_session_folder(session_folder_path, calibration_toml_path, tasks_to_run, num_workers=8)
 
@@ -8,30 +8,9 @@ from freemocap_utils.mediapipe_skeleton_builder import mediapipe_indices
 from scipy import signal
 import scipy
 from freemocap_utils.skeleton_interpolation import interpolate_freemocap_data
+from freemocap_utils.skeleton_filtering import filter_skeleton_data
 
 
-def butter_lowpass_filter(data, cutoff, sampling_rate, order):
-    """ Run a low pass butterworth filter on a single column of data"""
-    nyquist_freq = 0.5*sampling_rate
-    normal_cutoff = cutoff / nyquist_freq
-    # Get the filter coefficients 
-    b, a = signal.butter(order, normal_cutoff, btype='low', analog=False)
-    y = signal.filtfilt(b, a, data)
-    return y
-
-
-def filter_skeleton(skeleton_3d_data, cutoff, sampling_rate, order):
-    """ Take in a 3d skeleton numpy array and run a low pass butterworth filter on each marker in the data"""
-    num_frames = skeleton_3d_data.shape[0]
-    num_markers = skeleton_3d_data.shape[1]
-    filtered_data = np.empty((num_frames,num_markers,3))
-
-    for marker in range(num_markers):
-        for x in range(3):
-            filtered_data[:,marker,x] = butter_lowpass_filter(skeleton_3d_data[:,marker,x],cutoff,sampling_rate,order)
-    
-    return filtered_data
-
 def downsample_data(data,time_old,time_new):
     num_markers = data.shape[1]
     num_dimensions = data.shape[2]
@@ -63,7 +42,7 @@ downsampled_freemocap_data = downsample_data(freemocap_data,time_old, time_new)
 path_to_qualisys_session_folder = Path(r"D:\ValidationStudy2022\FreeMocap_Data\qualisys_sesh_2022-05-24_16_02_53_JSM_T1_WalkRun")
 qualisys_data = np.load(path_to_qualisys_session_folder/'DataArrays'/'qualisys_origin_aligned_skeleton_3D.npy')
 interpolated_qualisys_data = interpolate_freemocap_data(qualisys_data)
-filtered_qualisys_skeleton = filter_skeleton(interpolated_qualisys_data,6,300,4)
+filtered_qualisys_skeleton = filter_skeleton_data(interpolated_qualisys_data,6,300,4)
 
 time_old_q = np.arange(0,182.13,1/300)
 time_new_q = np.arange(0,182.13,1/30)
@@ -0,0 +1,150 @@
+import json
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+AXIS_NAMES = ["x", "y", "z"]
+COLUMNAR_FILE_SUFFIXES = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# frames per parquet row group, so a frame range only has to decode the row groups it overlaps
+PARQUET_ROW_GROUP_SIZE = 4096
+
+PART_METADATA_KEY = b"freemocap_part"
+
+
+def get_columnar_path(path_to_table: Union[str, Path], columnar_format: str) -> Path:
+    """Swap the extension of a table path (e.g. the part's `.csv`) for the one of `columnar_format` ('parquet' or 'arrow')"""
+    if columnar_format not in COLUMNAR_FILE_SUFFIXES:
+        raise ValueError(f"Unsupported columnar format {columnar_format}, use one of {list(COLUMNAR_FILE_SUFFIXES)}")
+    return Path(path_to_table).with_suffix(COLUMNAR_FILE_SUFFIXES[columnar_format])
+
+
+def build_part_table(
+    part_frame_marker_xyz: np.ndarray, marker_names: List[str], part_name: str, dtype: np.dtype = np.float32
+) -> pa.Table:
+    """
+    Build an arrow table with one column per marker and axis (`{marker}_{axis}`, the same columns as the `csv` export).
+    Columns are float32 by default, pass `dtype=np.float64` to keep full precision.
+    The marker names, axes and part name go into the schema metadata, so readers can pick markers without parsing column names.
+    """
+    number_of_frames, number_of_markers, number_of_axes = part_frame_marker_xyz.shape
+    assert number_of_markers == len(marker_names), (
+        f"Mismatch in number of markers in the data ({number_of_markers}) and number of marker names ({len(marker_names)})"
+    )
+
+    part_frame_marker_xyz = np.asarray(part_frame_marker_xyz, dtype=dtype)
+    columns = [part_frame_marker_xyz[:, marker_index, axis_index] for marker_index in range(number_of_markers) for axis_index in range(number_of_axes)]
+    column_names = [f"{marker_name}_{axis_name}" for marker_name in marker_names for axis_name in AXIS_NAMES[:number_of_axes]]
+
+    part_metadata = {"part": part_name, "marker_names": list(marker_names), "axes": AXIS_NAMES[:number_of_axes]}
+    return pa.table(columns, names=column_names, metadata={PART_METADATA_KEY: json.dumps(part_metadata)})
+
+
+def save_part_table(
+    part_frame_marker_xyz: np.ndarray,
+    marker_names: List[str],
+    part_name: str,
+    path_to_table: Union[str, Path],
+    dtype: np.dtype = np.float32,
+) -> Path:
+    """Save one part (body, hands, face) as Parquet or Arrow IPC, chosen by the file extension of `path_to_table`"""
+    path_to_table = Path(path_to_table)
+    part_table = build_part_table(part_frame_marker_xyz, marker_names, part_name, dtype=dtype)
+
+    if path_to_table.suffix == COLUMNAR_FILE_SUFFIXES["parquet"]:
+        pq.write_table(part_table, path_to_table, row_group_size=PARQUET_ROW_GROUP_SIZE)
+    elif path_to_table.suffix == COLUMNAR_FILE_SUFFIXES["arrow"]:
+        # uncompressed so the file can be memory mapped and sliced without copying
+        feather.write_feather(part_table, path_to_table, compression="uncompressed")
+    else:
+        raise ValueError(f"Unsupported columnar file type {path_to_table.suffix}, use one of {list(COLUMNAR_FILE_SUFFIXES.values())}")
+
+    return path_to_table
+
+
+def _read_part_metadata(schema: pa.Schema) -> dict:
+    return json.loads(schema.metadata[PART_METADATA_KEY])
+
+
+def _get_column_names(part_metadata: dict, marker_names: Optional[List[str]]) -> List[str]:
+    if marker_names is None:
+        marker_names = part_metadata["marker_names"]
+
+    missing_marker_names = set(marker_names) - set(part_metadata["marker_names"])
+    if missing_marker_names:
+        raise KeyError(f"Markers {sorted(missing_marker_names)} are not in the {part_metadata['part']} table")
+
+    return [f"{marker_name}_{axis_name}" for marker_name in marker_names for axis_name in part_metadata["axes"]]
+
+
+def _read_parquet_frames(path_to_table: Path, column_names: List[str], start_frame: int, end_frame: Optional[int]) -> pa.Table:
+    """Read only the row groups that overlap [start_frame, end_frame), then trim to the exact frames"""
+    parquet_file = pq.ParquetFile(path_to_table)
+    row_group_sizes = [parquet_file.metadata.row_group(row_group).num_rows for row_group in range(parquet_file.num_row_groups)]
+    row_group_starts = np.concatenate([[0], np.cumsum(row_group_sizes)])
+
+    number_of_frames = int(row_group_starts[-1])
+    end_frame = number_of_frames if end_frame is None else min(end_frame, number_of_frames)
+    start_frame = min(start_frame, end_frame)
+
+    first_row_group = max(int(np.searchsorted(row_group_starts, start_frame, side="right")) - 1, 0)
+    last_row_group = int(np.searchsorted(row_group_starts, end_frame, side="left"))
+    row_groups = list(range(first_row_group, min(last_row_group, parquet_file.num_row_groups)))
+
+    if not row_groups:
+        return parquet_file.schema_arrow.empty_table().select(column_names)
+
+    part_table = parquet_file.read_row_groups(row_groups, columns=column_names)
+    return part_table.slice(start_frame - int(row_group_starts[first_row_group]), end_frame - start_frame)
+
+
+def load_part_dataframe(
+    path_to_table: Union[str, Path],
+    marker_names: Optional[List[str]] = None,
+    start_frame: int = 0,
+    end_frame: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Load a part table saved by `save_part_table` into a dataframe with the same columns as the `csv` export.
+    Only the columns of `marker_names` (all markers by default) and the frames in [start_frame, end_frame) are read:
+    Parquet decodes just the row groups covering those frames, Arrow IPC is memory mapped and sliced.
+    """
+    path_to_table = Path(path_to_table)
+
+    if path_to_table.suffix == COLUMNAR_FILE_SUFFIXES["parquet"]:
+        part_metadata = _read_part_metadata(pq.read_schema(path_to_table))
+        column_names = _get_column_names(part_metadata, marker_names)
+        part_table = _read_parquet_frames(path_to_table, column_names, start_frame, end_frame)
+    elif path_to_table.suffix == COLUMNAR_FILE_SUFFIXES["arrow"]:
+        part_table = feather.read_table(path_to_table, memory_map=True)
+        column_names = _get_column_names(_read_part_metadata(part_table.schema), marker_names)
+        number_of_frames = part_table.num_rows
+        end_frame = number_of_frames if end_frame is None else min(end_frame, number_of_frames)
+        start_frame = min(start_frame, end_frame)
+        part_table = part_table.select(column_names).slice(start_frame, end_frame - start_frame)
+    else:
+        raise ValueError(f"Unsupported columnar file type {path_to_table.suffix}, use one of {list(COLUMNAR_FILE_SUFFIXES.values())}")
+
+    return part_table.to_pandas()
+
+
+def load_part_array(
+    path_to_table: Union[str, Path],
+    marker_names: Optional[List[str]] = None,
+    start_frame: int = 0,
+    end_frame: Optional[int] = None,
+) -> Tuple[np.ndarray, List[str]]:
+    """Same as `load_part_dataframe`, but returns a (frames, markers, 3) array (in the dtype the table was saved with) and the marker names in its order"""
+    part_dataframe = load_part_dataframe(path_to_table, marker_names, start_frame, end_frame)
+
+    # columns are `{marker}_{axis}`, with the axes of each marker next to each other
+    number_of_axes = len(AXIS_NAMES)
+    marker_names = [column_name[: -len("_x")] for column_name in part_dataframe.columns[::number_of_axes]]
+
+    part_frame_marker_xyz = part_dataframe.to_numpy().reshape(len(part_dataframe), len(marker_names), number_of_axes)
+    return part_frame_marker_xyz, marker_names
@@ -1,7 +1,7 @@
 # %%
 import logging
 from pathlib import Path
-from typing import Union
+from typing import Optional, Union
 
 import numpy as np
 import pandas as pd
@@ -15,13 +15,25 @@ from freemocap.system.paths_and_filenames.file_and_folder_names import (
 
 logger = logging.getLogger(__name__)
 
+AXIS_NAMES = ["x", "y", "z"]
+
 
 def convert_mediapipe_npy_to_csv(
     mediapipe_3d_frame_trackedPoint_xyz: np.ndarray,
     output_data_folder_path: Union[str, Path],
+    columnar_format: Optional[str] = None,
+    save_csv: bool = True,
+    columnar_dtype: np.dtype = np.float32,
 ):
+    """
+    Split the full mediapipe (frames, markers, xyz) array into body, hands and face, and save each part as `npy` and `csv`.
+    If `columnar_format` is 'parquet' or 'arrow', each part is also saved as a float32 table next to its `csv`
+    (same name, different extension), which `export.columnar_export.load_part_dataframe` can read a subset of.
+    The tables are float32 unless `columnar_dtype` says otherwise.
+    `save_csv=False` skips the `csv` files.
+    """
     logger.info(
-        f"Converting npy data with shape: {mediapipe_3d_frame_trackedPoint_xyz.shape} into `csv` and smaller `npy` files"
+        f"Converting npy data with shape: {mediapipe_3d_frame_trackedPoint_xyz.shape} into `csv`{f' and `{columnar_format}`' if columnar_format else ''} and smaller `npy` files"
     )
 
     # %%
@@ -106,218 +118,43 @@ def convert_mediapipe_npy_to_csv(
     np.save(str(Path(output_data_folder_path) / "mediapipe_face_3d_xyz.npy"), face_3d_xyz)
 
     # %%
-    # create pandas data frame headers
-
-    body_3d_xyz_header = []
-    for landmark_name in mediapipe_pose_landmark_names:
-        body_3d_xyz_header.append(f"{landmark_name}_x")
-        body_3d_xyz_header.append(f"{landmark_name}_y")
-        body_3d_xyz_header.append(f"{landmark_name}_z")
+    # marker names of each part, the `csv` columns are `{marker_name}_{x/y/z}`
 
-    right_hand_3d_xyz_header = []
-    for landmark_name in mediapipe_hand_landmark_names:
-        right_hand_3d_xyz_header.append(f"right_hand_{landmark_name}_x")
-        right_hand_3d_xyz_header.append(f"right_hand_{landmark_name}_y")
-        right_hand_3d_xyz_header.append(f"right_hand_{landmark_name}_z")
-
-    left_hand_3d_xyz_header = []
-    for landmark_name in mediapipe_hand_landmark_names:
-        left_hand_3d_xyz_header.append(f"left_hand_{landmark_name}_x")
-        left_hand_3d_xyz_header.append(f"left_hand_{landmark_name}_y")
-        left_hand_3d_xyz_header.append(f"left_hand_{landmark_name}_z")
-
-    face_3d_xyz_header = []
-    for landmark_number in range(last_face_marker_index - first_face_marker_index):
-        face_3d_xyz_header.append(f"face_{str(landmark_number).zfill(4)}_x")
-        face_3d_xyz_header.append(f"face_{str(landmark_number).zfill(4)}_y")
-        face_3d_xyz_header.append(f"face_{str(landmark_number).zfill(4)}_z")
-    #
-    # logger.debug(
-    #     f"length of body 3d xyz header: {len(body_3d_xyz_header)}, should be: {number_of_body_points * 3}"
-    # )
-    # logger.debug(
-    #     f"length of right hand 3d xyz header: {len(right_hand_3d_xyz_header)}, should be: {number_of_hand_points * 3}"
-    # )
-    # logger.debug(
-    #     f"length of left hand 3d xyz header: {len(left_hand_3d_xyz_header)}, should be: {number_of_hand_points * 3}"
-    # )
-    # logger.debug(
-    #     f"length of face 3d xyz header: {len(face_3d_xyz_header)}, should be: {number_of_face_points * 3}"
-    # )
+    body_marker_names = mediapipe_pose_landmark_names
+    right_hand_marker_names = [f"right_hand_{landmark_name}" for landmark_name in mediapipe_hand_landmark_names]
+    left_hand_marker_names = [f"left_hand_{landmark_name}" for landmark_name in mediapipe_hand_landmark_names]
+    face_marker_names = [f"face_{str(landmark_number).zfill(4)}" for landmark_number in range(number_of_face_points)]
 
     # %%
+    output_data_folder_path = Path(output_data_folder_path)
     number_of_frames = mediapipe_3d_frame_trackedPoint_xyz.shape[0]
-    body_flat = body_3d_xyz.reshape(number_of_frames, number_of_body_points * 3)
-
-    body_dataframe = pd.DataFrame(body_flat, columns=body_3d_xyz_header)
-    body_dataframe.to_csv(str(Path(output_data_folder_path) / MEDIAPIPE_BODY_3D_DATAFRAME_CSV_FILE_NAME), index=False)
-
-    right_hand_flat = right_hand_3d_xyz.reshape(number_of_frames, number_of_hand_points * 3)
-    right_hand_dataframe = pd.DataFrame(right_hand_flat, columns=right_hand_3d_xyz_header)
-    right_hand_dataframe.to_csv(
-        str(Path(output_data_folder_path) / MEDIAPIPE_RIGHT_HAND_3D_DATAFRAME_CSV_FILE_NAME),
-        index=False,
-    )
-
-    left_hand_flat = left_hand_3d_xyz.reshape(number_of_frames, number_of_hand_points * 3)
-    left_hand_dataframe = pd.DataFrame(left_hand_flat, columns=left_hand_3d_xyz_header)
-    left_hand_dataframe.to_csv(
-        str(Path(output_data_folder_path) / MEDIAPIPE_LEFT_HAND_3D_DATAFRAME_CSV_FILE_NAME),
-        index=False,
-    )
-
-    face_flat = face_3d_xyz.reshape(number_of_frames, number_of_face_points * 3)
-    face_dataframe = pd.DataFrame(face_flat, columns=face_3d_xyz_header)
-    face_dataframe.to_csv(str(Path(output_data_folder_path) / "mediapipe_face_3d_xyz.csv"), index=False)
-
-    # %%
-
-    # %%
-    mediapipe_pose_landmark_names = [landmark.name.lower() for landmark in mp_holistic.PoseLandmark]
-    mediapipe_hand_landmark_names = [landmark.name.lower() for landmark in mp_holistic.HandLandmark]
-    # face_landmark_names = [landmark.name.lower() for landmark in mp_holistic.PoseLandmark] #gonna have the clever for the face
-
-    # logger.debug(f"Body tracked point names: {mediapipe_pose_landmark_names}")
-    # logger.debug(mediapipe_hand_landmark_names)
-
-    # %%
-    # get number of points in body, hands, face
-
-    number_of_body_points = len(mediapipe_pose_landmark_names)
-    number_of_hand_points = len(mediapipe_hand_landmark_names)
-
-    first_body_marker_index = 0
-    last_body_marker_index = number_of_body_points - 1
-
-    first_right_hand_marker_index = last_body_marker_index + 1
-    last_right_hand_marker_index = number_of_body_points + number_of_hand_points - 1
-
-    first_left_hand_marker_index = last_right_hand_marker_index + 1
-    last_left_hand_marker_index = last_right_hand_marker_index + 1 + number_of_hand_points - 1
-
-    first_face_marker_index = last_left_hand_marker_index + 1
-    last_face_marker_index = mediapipe_3d_frame_trackedPoint_xyz.shape[1]
-
-    number_of_face_points = last_face_marker_index - first_face_marker_index
-
-    # logger.debug(
-    #     f"body tracked point indices: {first_body_marker_index}:{last_body_marker_index}"
-    # )
-    # logger.debug(
-    #     f"right hand tracked point indices: {first_right_hand_marker_index}:{last_right_hand_marker_index}"
-    # )
-    # logger.debug(
-    #     f"left hand tracked point indices: {first_left_hand_marker_index}:{last_left_hand_marker_index}"
-    # )
-    # logger.debug(
-    #     f"face tracked point indices: {first_face_marker_index}:{last_face_marker_index}"
-    # )
-    #
-    # logger.debug(
-    #     f"number of body points: {last_body_marker_index - first_body_marker_index + 1}"
-    # )
-    # logger.debug(
-    #     f"number of right hand points: {last_right_hand_marker_index - first_right_hand_marker_index + 1}"
-    # )
-    # logger.debug(
-    #     f"number of left hand points: {last_left_hand_marker_index - first_left_hand_marker_index + 1}"
-    # )
-    # logger.debug(
-    #     f"number of face points: {last_face_marker_index - first_face_marker_index + 1}"
-    # )
 
-    # %%
-    body_3d_xyz = mediapipe_3d_frame_trackedPoint_xyz[:, first_body_marker_index : last_body_marker_index + 1, :]
-    right_hand_3d_xyz = mediapipe_3d_frame_trackedPoint_xyz[
-        :, first_right_hand_marker_index : last_right_hand_marker_index + 1, :
-    ]
-    left_hand_3d_xyz = mediapipe_3d_frame_trackedPoint_xyz[
-        :, first_left_hand_marker_index : last_left_hand_marker_index + 1, :
+    parts_to_save = [
+        ("body", body_3d_xyz, body_marker_names, MEDIAPIPE_BODY_3D_DATAFRAME_CSV_FILE_NAME),
+        ("right_hand", right_hand_3d_xyz, right_hand_marker_names, MEDIAPIPE_RIGHT_HAND_3D_DATAFRAME_CSV_FILE_NAME),
+        ("left_hand", left_hand_3d_xyz, left_hand_marker_names, MEDIAPIPE_LEFT_HAND_3D_DATAFRAME_CSV_FILE_NAME),
+        ("face", face_3d_xyz, face_marker_names, "mediapipe_face_3d_xyz.csv"),
     ]
-    face_3d_xyz = mediapipe_3d_frame_trackedPoint_xyz[:, first_face_marker_index : last_face_marker_index + 1, :]
-
-    logger.debug(f"body 3d xyz shape: {body_3d_xyz.shape}")
-    logger.debug(f"right hand 3d xyz shape: {right_hand_3d_xyz.shape}")
-    logger.debug(f"left hand 3d xyz shape: {left_hand_3d_xyz.shape}")
-    logger.debug(f"face 3d xyz shape: {face_3d_xyz.shape}")
-
-    # %%
-    # save broken up npy files
-    np.save(str(Path(output_data_folder_path) / "mediapipe_body_3d_xyz.npy"), body_3d_xyz)
-    np.save(
-        str(Path(output_data_folder_path) / "mediapipe_right_hand_3d_xyz.npy"),
-        right_hand_3d_xyz,
-    )
-    np.save(
-        str(Path(output_data_folder_path) / "mediapipe_left_hand_3d_xyz.npy"),
-        left_hand_3d_xyz,
-    )
-    np.save(str(Path(output_data_folder_path) / "mediapipe_face_3d_xyz.npy"), face_3d_xyz)
-
-    # %%
-    # create pandas data frame headers
-
-    body_3d_xyz_header = []
-    for landmark_name in mediapipe_pose_landmark_names:
-        body_3d_xyz_header.append(f"{landmark_name}_x")
-        body_3d_xyz_header.append(f"{landmark_name}_y")
-        body_3d_xyz_header.append(f"{landmark_name}_z")
-
-    right_hand_3d_xyz_header = []
-    for landmark_name in mediapipe_hand_landmark_names:
-        right_hand_3d_xyz_header.append(f"right_hand_{landmark_name}_x")
-        right_hand_3d_xyz_header.append(f"right_hand_{landmark_name}_y")
-        right_hand_3d_xyz_header.append(f"right_hand_{landmark_name}_z")
-
-    left_hand_3d_xyz_header = []
-    for landmark_name in mediapipe_hand_landmark_names:
-        left_hand_3d_xyz_header.append(f"left_hand_{landmark_name}_x")
-        left_hand_3d_xyz_header.append(f"left_hand_{landmark_name}_y")
-        left_hand_3d_xyz_header.append(f"left_hand_{landmark_name}_z")
-
-    face_3d_xyz_header = []
-    for landmark_number in range(last_face_marker_index - first_face_marker_index):
-        face_3d_xyz_header.append(f"face_{str(landmark_number).zfill(4)}_x")
-        face_3d_xyz_header.append(f"face_{str(landmark_number).zfill(4)}_y")
-        face_3d_xyz_header.append(f"face_{str(landmark_number).zfill(4)}_z")
-
-    logger.debug(
-        f"length of body 3d xyz `.csv` header: {len(body_3d_xyz_header)}, should be: {number_of_body_points * 3}"
-    )
-    logger.debug(
-        f"length of right hand 3d xyz `.csv` header: {len(right_hand_3d_xyz_header)}, should be: {number_of_hand_points * 3}"
-    )
-    logger.debug(
-        f"length of left hand 3d xyz `.csv` header: {len(left_hand_3d_xyz_header)}, should be: {number_of_hand_points * 3}"
-    )
-    logger.debug(
-        f"length of face 3d xyz `.csv` header: {len(face_3d_xyz_header)}, should be: {number_of_face_points * 3}"
-    )
-
-    # %%
-    number_of_frames = mediapipe_3d_frame_trackedPoint_xyz.shape[0]
-    body_flat = body_3d_xyz.reshape(number_of_frames, number_of_body_points * 3)
-
-    body_dataframe = pd.DataFrame(body_flat, columns=body_3d_xyz_header)
-    body_dataframe.to_csv(str(Path(output_data_folder_path) / MEDIAPIPE_BODY_3D_DATAFRAME_CSV_FILE_NAME), index=False)
-
-    right_hand_flat = right_hand_3d_xyz.reshape(number_of_frames, number_of_hand_points * 3)
-    right_hand_dataframe = pd.DataFrame(right_hand_flat, columns=right_hand_3d_xyz_header)
-    right_hand_dataframe.to_csv(
-        str(Path(output_data_folder_path) / MEDIAPIPE_RIGHT_HAND_3D_DATAFRAME_CSV_FILE_NAME),
-        index=False,
-    )
-
-    left_hand_flat = left_hand_3d_xyz.reshape(number_of_frames, number_of_hand_points * 3)
-    left_hand_dataframe = pd.DataFrame(left_hand_flat, columns=left_hand_3d_xyz_header)
-    left_hand_dataframe.to_csv(
-        str(Path(output_data_folder_path) / MEDIAPIPE_LEFT_HAND_3D_DATAFRAME_CSV_FILE_NAME),
-        index=False,
-    )
 
-    face_flat = face_3d_xyz.reshape(number_of_frames, number_of_face_points * 3)
-    face_dataframe = pd.DataFrame(face_flat, columns=face_3d_xyz_header)
-    face_dataframe.to_csv(str(Path(output_data_folder_path) / "mediapipe_face_3d_xyz.csv"), index=False)
+    if columnar_format is not None:
+        # pyarrow is only needed for the columnar export
+        from export.columnar_export import get_columnar_path, save_part_table
+
+    for part_name, part_3d_xyz, part_marker_names, csv_file_name in parts_to_save:
+        if save_csv:
+            part_3d_xyz_header = [f"{marker_name}_{axis_name}" for marker_name in part_marker_names for axis_name in AXIS_NAMES]
+            part_flat = part_3d_xyz.reshape(number_of_frames, len(part_marker_names) * 3)
+            part_dataframe = pd.DataFrame(part_flat, columns=part_3d_xyz_header)
+            part_dataframe.to_csv(str(output_data_folder_path / csv_file_name), index=False)
+
+        if columnar_format is not None:
+            save_part_table(
+                part_frame_marker_xyz=part_3d_xyz,
+                marker_names=part_marker_names,
+                part_name=part_name,
+                path_to_table=get_columnar_path(output_data_folder_path / csv_file_name, columnar_format),
+                dtype=columnar_dtype,
+            )
 
     logger.info("Done saving out `csv` and broken up `npy` files")
 
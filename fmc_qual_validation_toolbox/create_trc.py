@@ -1,5 +1,11 @@
 import csv
 
+import numpy as np
+import pandas as pd
+
+DEFAULT_TRC_CHUNK_SIZE = 10000 #frames written per np.savetxt call
+TRC_WRITE_BUFFER_SIZE = 1 << 20
+
 
 def get_trajectory_dataframe(self):
     """returns a dataframe of trajectories for a session"""
@@ -63,68 +69,83 @@ def get_trajectory_dataframe(self):
 
 
 
-def create_trajectory_trc(skeleton_data_frame, keypoints_names, frame_rate, data_array_folder_path):
-    
-    #Header
+def write_trc_header(out_file, trc_filename, keypoints_names, frame_rate, num_frames):
+    """writes the TRC header rows (file info, marker names and X/Y/Z column labels)"""
     data_rate = camera_rate = orig_data_rate = frame_rate
-    num_frames = len(skeleton_data_frame)
-    num_frame_range = range(num_frames)
     num_markers = len(keypoints_names)
     units = 'mm'
-    orig_data_start_frame = num_frame_range[0]
-    orig_num_frames = num_frame_range[-1]
+    orig_data_start_frame = 0
+    orig_num_frames = num_frames - 1
+
+    tsv_writer = csv.writer(out_file, delimiter='\t')
+    tsv_writer.writerow(["PathFileType",
+                        "4", 
+                        "(X/Y/Z)",	
+                        trc_filename])
+    tsv_writer.writerow(["DataRate",
+                        "CameraRate",
+                        "NumFrames",
+                        "NumMarkers", 
+                        "Units",
+                        "OrigDataRate",
+                        "OrigDataStartFrame",
+                        "OrigNumFrames"])
+    tsv_writer.writerow([data_rate, 
+                        camera_rate,
+                        num_frames, 
+                        num_markers, 
+                        units, 
+                        orig_data_rate, 
+                        orig_data_start_frame, 
+                        orig_num_frames])
+
+    header_names = ['Frame#', 'Time']
+    for keypoint in keypoints_names:
+        header_names.append(keypoint)
+        header_names.append("")
+        header_names.append("")
+
+    tsv_writer.writerow(header_names)
+
+    header_names = ["",""]
+    for i in range(1,len(keypoints_names)+1):
+        header_names.append("X"+str(i))
+        header_names.append("Y"+str(i))
+        header_names.append("Z"+str(i))    
     
-    trc_filename = 'skel_trace.trc'
+    tsv_writer.writerow(header_names)
+    tsv_writer.writerow("")    
+
+
+def write_trc_data(out_file, skeleton_data, frame_rate, chunk_size = DEFAULT_TRC_CHUNK_SIZE):
+    """writes the Frame#, Time and marker columns for every frame, chunk_size frames at a time, 
+    so only one chunk of a (memory mapped) recording is ever in memory"""
+    num_frames = skeleton_data.shape[0]
+    row_format = '\t'.join(['%d'] + ['%.10g']*(1 + int(np.prod(skeleton_data.shape[1:]))))
+
+    for chunk_start in range(0, num_frames, chunk_size):
+        chunk_end = min(chunk_start + chunk_size, num_frames)
+        frame_numbers = np.arange(chunk_start, chunk_end)
+        marker_chunk = np.asarray(skeleton_data[chunk_start:chunk_end]).reshape(chunk_end - chunk_start, -1)
+
+        trc_rows = np.column_stack([frame_numbers, frame_numbers/float(frame_rate), marker_chunk])
+        np.savetxt(out_file, trc_rows, fmt=row_format, newline='\r\n')
+
+
+def create_trajectory_trc(skeleton_data, keypoints_names, frame_rate, data_array_folder_path, trc_filename = 'skel_trace.trc', chunk_size = DEFAULT_TRC_CHUNK_SIZE):
+    """
+    writes skeleton_data to data_array_folder_path/trc_filename. skeleton_data can be a (frames, markers, 3) array, 
+    or flattened to (frames, markers*3) (a dataframe of that also works, and is left unchanged). 
+    Arrays are streamed to the file in chunks of chunk_size frames, so a memory mapped array (np.load(..., mmap_mode='r')) is never loaded all at once
+    """
+    if isinstance(skeleton_data, pd.DataFrame):
+        skeleton_data = skeleton_data.to_numpy()
+
     trc_path = data_array_folder_path/trc_filename
 
-    with open(trc_path, 'wt', newline='', encoding='utf-8') as out_file:
-        tsv_writer = csv.writer(out_file, delimiter='\t')
-        tsv_writer.writerow(["PathFileType",
-                            "4", 
-                            "(X/Y/Z)",	
-                            trc_filename])
-        tsv_writer.writerow(["DataRate",
-                            "CameraRate",
-                            "NumFrames",
-                            "NumMarkers", 
-                            "Units",
-                            "OrigDataRate",
-                            "OrigDataStartFrame",
-                            "OrigNumFrames"])
-        tsv_writer.writerow([data_rate, 
-                            camera_rate,
-                            num_frames, 
-                            num_markers, 
-                            units, 
-                            orig_data_rate, 
-                            orig_data_start_frame, 
-                            orig_num_frames])
-
-        header_names = ['Frame#', 'Time']
-        for keypoint in keypoints_names:
-            header_names.append(keypoint)
-            header_names.append("")
-            header_names.append("")
-
-        tsv_writer.writerow(header_names)
-
-        header_names = ["",""]
-        for i in range(1,len(keypoints_names)+1):
-            header_names.append("X"+str(i))
-            header_names.append("Y"+str(i))
-            header_names.append("Z"+str(i))    
-        
-        tsv_writer.writerow(header_names)
-        tsv_writer.writerow("")    
-
-        skeleton_data_frame.insert(0, "Frame", [str(i) for i in range(0, len(skeleton_data_frame))])
-        skeleton_data_frame.insert(1, "Time", skeleton_data_frame["Frame"].astype(float) / float(camera_rate))
-
-                # and finally actually write the trajectories
-        for row in range(0, len(skeleton_data_frame)):
-            tsv_writer.writerow(skeleton_data_frame.iloc[row].tolist())
-
-        f = 2 
+    with open(trc_path, 'wt', newline='', encoding='utf-8', buffering=TRC_WRITE_BUFFER_SIZE) as out_file:
+        write_trc_header(out_file, trc_filename, keypoints_names, frame_rate, skeleton_data.shape[0])
+        write_trc_data(out_file, skeleton_data, frame_rate, chunk_size)
 
 
 def flatten_mediapipe_data(skeleton_3d_data):
@@ -141,9 +162,6 @@ if __name__ == '__main__':
     import socket
     from pathlib import Path
 
-    import numpy as np
-    import pandas as pd
-
     from fmc_validation_toolbox.mediapipe_skeleton_builder import mediapipe_indices, slice_mediapipe_data   
 
     this_computer_name = socket.gethostname()
@@ -165,15 +183,11 @@ if __name__ == '__main__':
 
 
     data_array_folder_path = freemocap_data_folder_path / sessionID / data_array_folder
-    skel3d_data = np.load(data_array_folder_path / array_name)
+    skel3d_data = np.load(data_array_folder_path / array_name, mmap_mode='r')
     save_path = data_array_folder_path/save_name
 
     skel_body_points = slice_mediapipe_data(skel3d_data,33)
-    skel_3d_flat = flatten_mediapipe_data(skel_body_points)
-
-#create_dataframe(skel_3d_flat,30)
-    skel_3d_flat_dataframe = pd.DataFrame(skel_3d_flat)
 
-    create_trajectory_trc(skel_3d_flat_dataframe,mediapipe_indices, 30, data_array_folder_path)
+    create_trajectory_trc(skel_body_points,mediapipe_indices, 30, data_array_folder_path)
 
 
@@ -23,24 +23,12 @@ import scipy.io as sio
 
 #import debugging_plot_tools
 
+from fmc_qual_validation_toolbox.mediapipe_skeleton_builder import mediapipe_indices
+from fmc_qual_validation_toolbox.qualisys_skeleton_builder import qualisys_indices
 
-def find_velocity_values_within_limit(skeleton_velocity_data, velocity_limit):
-    """
-    This function takes in a skeleton velocity data array and a limit and returns the indices of the values that are within the limit
-    """
-    indices = []
-    for i in range(len(skeleton_velocity_data)):
-        if abs(skeleton_velocity_data[i]) <= velocity_limit:
-            indices.append(i+1) #add 1 to account for the difference in indices between the position and velocity data
-    return indices
-
-def find_matching_indices_in_lists(list_1,list_2,list_3,list_4):
-    """
-    This function takes in four lists and returns the indices of the values that are in all four lists
-    """
-    matching_values = [x for x in list_1 if x in list_2 and x in list_3 and x in list_4]
-
-    return matching_values
+SKELETON_INDICES = {'mediapipe': mediapipe_indices, 'qualisys': qualisys_indices}
+FOOT_MARKER_NAMES = ['right_heel', 'right_foot_index', 'left_heel', 'left_foot_index']
+MINIMUM_GOOD_FRAME = 75 #frames at the start of a recording are never picked
 
 
 def set_axes_ranges(plot_ax,skeleton_data,ax_range):
@@ -53,64 +41,59 @@ def set_axes_ranges(plot_ax,skeleton_data,ax_range):
     plot_ax.set_ylim(my-ax_range,my+ax_range)
     plot_ax.set_zlim(mz-ax_range,mz+ax_range)     
 
-def find_best_velocity_guess(skeleton_type_to_use, skeleton_velocity_data, velocity_guess, iteration_range):
+def calculate_foot_stillness_scores(skeleton_data, skeleton_indices, smoothing_window = 5):
     """
-    This function iterates over velocity data and tries to pare down to a single frame that has the closest velocity to 0 for all foot markers
+    This function gives every frame a score for how still the feet are: the largest speed of the heel and toe markers,
+    averaged over a window of smoothing_window frames centered on the frame. Lower is stiller.
+    Frames whose window has missing data (and frame 0, which has no velocity) get a score of inf
     """
-    if skeleton_type_to_use == 'mediapipe':
-        #skeleton_data_path = this_freemocap_data_path/'mediapipe_origin_corrected_and_rotated.npy'
-        right_heel_index = 30
-        right_toe_index = 32
-        left_heel_index = 29
-        left_toe_index = 31
+    foot_marker_indices = [skeleton_indices.index(marker_name) for marker_name in FOOT_MARKER_NAMES]
+    num_frames = skeleton_data.shape[0]
 
-    elif skeleton_type_to_use == 'qualisys':
+    #speed of each foot marker between consecutive frames, with the largest one taken as the frame score
+    #(velocity sample i is the change into frame i+1, the same offset the old velocity lists used)
+    foot_marker_speeds = np.linalg.norm(np.diff(skeleton_data[:,foot_marker_indices,:], axis=0), axis=2)
+    raw_scores = np.full(num_frames, np.nan)
+    raw_scores[1:] = np.max(foot_marker_speeds, axis=1)
 
-        right_heel_index = 12
-        right_toe_index = 14
-        left_heel_index = 11
-        left_toe_index = 13
+    #moving average from prefix sums, so every window costs the same regardless of its size
+    valid_scores = np.isfinite(raw_scores)
+    cumulative_scores = np.concatenate([[0], np.cumsum(np.where(valid_scores, raw_scores, 0))])
+    cumulative_invalid = np.concatenate([[0], np.cumsum(~valid_scores)])
 
-  
+    window_starts = np.clip(np.arange(num_frames) - smoothing_window//2, 0, num_frames)
+    window_ends = np.clip(window_starts + smoothing_window, 0, num_frames)
+    window_lengths = window_ends - window_starts
 
+    stillness_scores = (cumulative_scores[window_ends] - cumulative_scores[window_starts])/window_lengths
+    stillness_scores[(cumulative_invalid[window_ends] - cumulative_invalid[window_starts]) > 0] = np.inf
 
-    skeleton_data_velocity_x_right_heel = skeleton_velocity_data[:,right_heel_index,0]
-    skeleton_data_velocity_x_right_toe = skeleton_velocity_data[:,right_toe_index,0]
-    skeleton_data_velocity_x_left_heel = skeleton_velocity_data[:,left_heel_index,0]
-    skeleton_data_velocity_x_left_toe = skeleton_velocity_data[:,left_toe_index,0]
+    return stillness_scores
 
-    #get a list of the frames where the velocity for that marker is within the velocity limit 
-    right_heel_x_velocity_limits = find_velocity_values_within_limit(skeleton_data_velocity_x_right_heel, velocity_guess)
-    right_toe_x_velocity_limits = find_velocity_values_within_limit(skeleton_data_velocity_x_right_toe, velocity_guess)
-    left_heel_x_velocity_limits = find_velocity_values_within_limit(skeleton_data_velocity_x_left_heel, velocity_guess)
-    left_toe_x_velocity_limits = find_velocity_values_within_limit(skeleton_data_velocity_x_left_toe, velocity_guess)
-
-    #return a list of matching frame indices from the four lists generated above 
-    matching_values = find_matching_indices_in_lists(right_heel_x_velocity_limits, right_toe_x_velocity_limits, left_heel_x_velocity_limits, left_toe_x_velocity_limits)
-    matching_values = [x for x in matching_values if x>75]
-    
-    print(matching_values)
-    if len(matching_values) > 1 and velocity_guess > 0:
-        #if there are multiple matching values, decrease the guess a little bit and run the function again
-        #  
-        velocity_guess = velocity_guess - iteration_range
-        print('Current Velocity Guess: ',velocity_guess, '\n','Number of Matching Values: ', len(matching_values))
-        matching_values, velocity_guess = find_best_velocity_guess(skeleton_type_to_use,skeleton_velocity_data, velocity_guess, iteration_range)
+def find_good_frame_candidates(skeleton_data, skeleton_indices, num_candidates = 1, smoothing_window = 5, minimum_frame = MINIMUM_GOOD_FRAME):
+    """
+    This function returns the num_candidates frames (after minimum_frame) where the feet are stillest, best first, along with their stillness scores
+    """
+    stillness_scores = calculate_foot_stillness_scores(skeleton_data, skeleton_indices, smoothing_window)
+    stillness_scores[:minimum_frame+1] = np.inf
 
-        f = 2
-    elif len(matching_values) == 0:
-        #if there are no matching values (we decreased our guess too far), reset the guess to be a bit smaller and run the function again with smaller intervals between the guesses
-        iteration_range = iteration_range/2
-        matching_values, velocity_guess = find_best_velocity_guess(skeleton_type_to_use, skeleton_velocity_data, velocity_guess + iteration_range*2, iteration_range)
+    num_valid_frames = np.count_nonzero(np.isfinite(stillness_scores))
+    if num_valid_frames == 0:
+        raise ValueError(f'No frames after frame {minimum_frame} have complete foot marker data to find a good frame from')
 
-        f = 2
-    elif len(matching_values) == 1:
-        print('Final Velocity Guess: ',velocity_guess, '\n','Number of Matching Values: ', len(matching_values))
+    num_candidates = min(num_candidates, num_valid_frames)
+    candidate_frames = np.argpartition(stillness_scores, num_candidates - 1)[:num_candidates]
+    candidate_frames = candidate_frames[np.argsort(stillness_scores[candidate_frames], kind='stable')]
 
-    return matching_values, velocity_guess
+    return candidate_frames, stillness_scores[candidate_frames]
 
 
-def find_good_frame(session_info, skeleton_data, initial_velocity_guess, debug = False):
+def find_good_frame(session_info, skeleton_data, initial_velocity_guess = None, debug = False, skeleton_indices = None, smoothing_window = 5, num_candidates = 1):
+    """
+    This function finds the frame where the feet are stillest (see find_good_frame_candidates). The foot markers are looked up by name
+    in skeleton_indices, which defaults to the marker list for the session's skeleton type.
+    initial_velocity_guess is no longer needed by the search and is only kept so existing calls still work
+    """
 
     sessionID = session_info['sessionID']
     skeleton_type_to_use = session_info['skeleton_type']
@@ -136,11 +119,14 @@ def find_good_frame(session_info, skeleton_data, initial_velocity_guess, debug =
     # else:
     #     print('Please enter a valid skeleton type to use')
 
-    skeleton_velocity_data = np.diff(skeleton_data, axis=0)
+    if skeleton_indices is None:
+        skeleton_indices = SKELETON_INDICES[skeleton_type_to_use]
 
-    matching_values, velocity_guess = find_best_velocity_guess(skeleton_type_to_use,skeleton_velocity_data, initial_velocity_guess, iteration_range=.1)
+    candidate_frames, candidate_scores = find_good_frame_candidates(skeleton_data, skeleton_indices, num_candidates, smoothing_window)
+    for candidate_frame, candidate_score in zip(candidate_frames, candidate_scores):
+        print('Candidate Frame: ', candidate_frame, ' Foot Stillness Score: ', candidate_score)
 
-    good_frame = matching_values[0]
+    good_frame = int(candidate_frames[0])
 
     if debug:
 
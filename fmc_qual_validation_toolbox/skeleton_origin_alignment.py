@@ -21,6 +21,7 @@ from datetime import datetime
 from fmc_qual_validation_toolbox.skeleton_data_holder import SkeletonDataHolder
 import scipy.io as sio
 
+DEFAULT_TRANSFORM_CHUNK_SIZE = 10000 #frames per matmul in apply_homogeneous_transform
 
 def create_vector(point1,point2): 
     """Put two points in, make a vector"""
@@ -75,6 +76,32 @@ def rotate_skeleton_frame(this_frame_aligned_skeleton_data, rotation_matrix):
     return this_frame_rotated_skeleton
 
 
+def create_homogeneous_transform(rotation_matrix = None, translation = None):
+    """Build a 4x4 homogeneous transform that rotates points and then translates them"""
+    homogeneous_transform = np.identity(4)
+    if rotation_matrix is not None:
+        homogeneous_transform[:3,:3] = rotation_matrix
+    if translation is not None:
+        homogeneous_transform[:3,3] = translation
+    return homogeneous_transform
+
+def apply_homogeneous_transform(skeleton_data, homogeneous_transform, out = None, chunk_size = DEFAULT_TRANSFORM_CHUNK_SIZE):
+    """Take in a (frames, tracked points, 3) skeleton array, and apply a 4x4 homogeneous transform to every point.
+    The result is written straight into out (allocated once if not given, pass the skeleton data itself to transform it in place),
+    chunk_size frames per matmul, so no other full size array is created"""
+    if out is None:
+        out = np.empty(skeleton_data.shape)
+    rotation_matrix_transposed = homogeneous_transform[:3,:3].T
+    translation = homogeneous_transform[:3,3]
+
+    for chunk_start in range(0, skeleton_data.shape[0], chunk_size):
+        chunk = slice(chunk_start, chunk_start + chunk_size)
+        #matmul copies the input chunk first if it overlaps out, so transforming in place is safe
+        np.matmul(skeleton_data[chunk], rotation_matrix_transposed, out = out[chunk])
+        out[chunk] += translation
+    return out
+
+
 def align_skeleton_with_origin(session_info:dict, this_freemocap_data_array_path:str, skeleton_data, skeleton_indices ,good_frame, debug = False):
 
     #sessionID = session_info['sessionID']
@@ -132,10 +159,12 @@ def align_skeleton_with_origin(session_info:dict, this_freemocap_data_array_path
     #origin_normal = create_normal_vector(x_vector,y_vector) #create a normal vector to the origin (basically the z axis)
     origin_normal_unit_vector = z_vector  #note - this is kinda unncessary because the origin normal unit vector == original normal vector 
 
-    num_frames = skeleton_data.shape[0]
+    #All the translations and rotations only depend on the good frame, so they are worked out on that one frame
+    #and composed into a single transform for each stage, which is then applied to the whole recording once
+    good_frame_data = skeleton_data[good_frame:good_frame+1,:,:]
 
     #Original Raw Data
-    raw_skeleton_holder = SkeletonDataHolder(skeleton_data, skeleton_indices, good_frame)
+    raw_skeleton_holder = SkeletonDataHolder(good_frame_data, skeleton_indices, 0)
 
     raw_good_frame_skeleton_data = raw_skeleton_holder.good_frame_skeleton_data
     raw_mid_hip_XYZ = raw_skeleton_holder.mid_hip_XYZ
@@ -143,21 +172,15 @@ def align_skeleton_with_origin(session_info:dict, this_freemocap_data_array_path
 
     #Translating Data
     mid_hip_translation_distance = calculate_translation_distance(raw_mid_hip_XYZ)
-    hip_translated_skeleton_data = np.zeros(skeleton_data.shape)
-    foot_translated_skeleton_data = hip_translated_skeleton_data.copy()
+    hip_translated_transform = create_homogeneous_transform(translation = -1*mid_hip_translation_distance)
 
-    for frame in track(range(num_frames)):
-        hip_translated_skeleton_data[frame,:,:] = translate_skeleton_frame(skeleton_data[frame,:,:],mid_hip_translation_distance) #translate the skeleton data for each frame  
-
-    hip_translated_skeleton_holder = SkeletonDataHolder(hip_translated_skeleton_data, skeleton_indices, good_frame)
+    hip_translated_skeleton_holder = SkeletonDataHolder(apply_homogeneous_transform(good_frame_data, hip_translated_transform), skeleton_indices, 0)
     hip_translated_mid_foot_XYZ = hip_translated_skeleton_holder.mid_foot_XYZ
 
     mid_foot_translated_distance = calculate_translation_distance(hip_translated_mid_foot_XYZ)
+    foot_translated_transform = create_homogeneous_transform(translation = -1*mid_foot_translated_distance) @ hip_translated_transform
 
-    for frame in track (range(num_frames)):
-        foot_translated_skeleton_data[frame,:,:] = translate_skeleton_frame(hip_translated_skeleton_data[frame,:,:],mid_foot_translated_distance)
-
-    foot_translated_skeleton_holder = SkeletonDataHolder(foot_translated_skeleton_data, skeleton_indices, good_frame)
+    foot_translated_skeleton_holder = SkeletonDataHolder(apply_homogeneous_transform(good_frame_data, foot_translated_transform), skeleton_indices, 0)
     foot_translated_good_frame_skeleton_data = foot_translated_skeleton_holder.good_frame_skeleton_data 
 
     foot_translated_mid_hip_XYZ = foot_translated_skeleton_holder.mid_hip_XYZ
@@ -169,13 +192,9 @@ def align_skeleton_with_origin(session_info:dict, this_freemocap_data_array_path
     #Rotating for +y alignment
 
     rotation_matrix_to_align_skeleton_with_positive_y = calculate_rotation_matrix(foot_translated_heel_unit_vector,-1*x_vector)
+    y_aligned_transform = create_homogeneous_transform(rotation_matrix = rotation_matrix_to_align_skeleton_with_positive_y) @ foot_translated_transform
 
-    y_aligned_skeleton_data = np.zeros(skeleton_data.shape)
-
-    for frame in track(range(num_frames)):
-        y_aligned_skeleton_data [frame,:,:] = rotate_skeleton_frame(foot_translated_skeleton_data[frame,:,:],rotation_matrix_to_align_skeleton_with_positive_y)
-
-    y_aligned_skeleton_holder = SkeletonDataHolder(y_aligned_skeleton_data, skeleton_indices, good_frame)
+    y_aligned_skeleton_holder = SkeletonDataHolder(apply_homogeneous_transform(good_frame_data, y_aligned_transform), skeleton_indices, 0)
     y_aligned_good_frame_skeleton_data = y_aligned_skeleton_holder.good_frame_skeleton_data
 
     y_aligned_mid_hip_XYZ = y_aligned_skeleton_holder.mid_hip_XYZ
@@ -186,14 +205,10 @@ def align_skeleton_with_origin(session_info:dict, this_freemocap_data_array_path
 
     #Rotating for spine alignment
 
-    spine_aligned_skeleton_data = np.zeros(skeleton_data.shape)
-
     rotation_matrix_to_align_spine = calculate_rotation_matrix(y_aligned_spine_unit_vector,origin_normal_unit_vector)
+    spine_aligned_transform = create_homogeneous_transform(rotation_matrix = rotation_matrix_to_align_spine) @ y_aligned_transform
 
-    for frame in track(range(num_frames)):
-        spine_aligned_skeleton_data [frame,:,:] = rotate_skeleton_frame(y_aligned_skeleton_data[frame,:,:],rotation_matrix_to_align_spine)
-
-    spine_aligned_skeleton_holder = SkeletonDataHolder(spine_aligned_skeleton_data, skeleton_indices, good_frame)
+    spine_aligned_skeleton_holder = SkeletonDataHolder(apply_homogeneous_transform(good_frame_data, spine_aligned_transform), skeleton_indices, 0)
     spine_aligned_good_frame_skeleton_data = spine_aligned_skeleton_holder.good_frame_skeleton_data
 
     spine_aligned_mid_hip_XYZ = spine_aligned_skeleton_holder.mid_hip_XYZ
@@ -205,9 +220,11 @@ def align_skeleton_with_origin(session_info:dict, this_freemocap_data_array_path
 
     if skeleton_type_to_plot == 'qualisys':
         print('saving qualisys aligned data')
+        y_aligned_skeleton_data = apply_homogeneous_transform(skeleton_data, y_aligned_transform)
         np.save(save_file,y_aligned_skeleton_data)
     elif skeleton_type_to_plot == 'mediapipe':  
         print('saving mediapipe aligned data')  
+        spine_aligned_skeleton_data = apply_homogeneous_transform(skeleton_data, spine_aligned_transform)
         np.save(save_file,spine_aligned_skeleton_data)
 
 
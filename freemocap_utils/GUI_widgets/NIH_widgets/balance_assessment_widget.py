@@ -44,6 +44,7 @@ class BalanceAssessmentWidget(QWidget):
     def run_COM_analysis(self):
         self.total_body_COM_data = self.load_COM_data(self.path_to_session_folder)
         self.path_length_calculator = PathLengthCalculator.PathLengthCalculator(self.total_body_COM_data)
+        self.sway_metrics = self.path_length_calculator.get_sway_metrics(self.condition_frames_dictionary)
         self.path_length_dictionary = self.calculate_path_lengths(self.condition_frames_dictionary)
         # self.save_condition_path_lengths(path_length_dictionary, self.path_to_data_analysis_folder)
         self.path_length_results.setText(str(self.path_length_dictionary))
@@ -58,10 +59,8 @@ class BalanceAssessmentWidget(QWidget):
         return total_body_COM_data
 
     def calculate_path_lengths(self, condition_dictionary):
-        path_length_dictionary = {}
-        for condition in condition_dictionary:
-            this_condition_frame_range = range(condition_dictionary[condition][0],condition_dictionary[condition][1])
-            path_length_dictionary[condition] = self.path_length_calculator.get_path_length(this_condition_frame_range)
+        #all conditions come out of a single pass in get_sway_metrics
+        path_length_dictionary = {condition: float(self.sway_metrics.loc[condition, 'normalized_path_length']) for condition in condition_dictionary}
 
         return path_length_dictionary
 
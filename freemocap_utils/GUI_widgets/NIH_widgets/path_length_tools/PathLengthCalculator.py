@@ -1,5 +1,7 @@
 import numpy as np
 
+from freemocap_utils.sway_metrics import calculate_sway_metrics
+
 class PathLengthCalculator():
 
     def __init__(self,freemocap_data:np.ndarray):
@@ -10,9 +12,7 @@ class PathLengthCalculator():
         return sliced_freemocap_data
 
     def calculate_path_length(self, sliced_freemocap_data):
-        path_length = 0
-        for frame_number in range(1,len(sliced_freemocap_data)):
-            path_length += self.calculate_distance(sliced_freemocap_data[frame_number-1],sliced_freemocap_data[frame_number])
+        path_length = np.sum(np.linalg.norm(np.diff(sliced_freemocap_data[:, :3], axis=0), axis=1))
 
         normalized_path_length = path_length/len(sliced_freemocap_data)
         return normalized_path_length
@@ -27,11 +27,12 @@ class PathLengthCalculator():
 
     def calculate_velocity(self, num_frame_range):
         sliced_freemocap_data = self.slice_data(self.freemocap_data,num_frame_range)
-        velocity_data = []
+        velocity_data = list(np.diff(sliced_freemocap_data[:, :3], axis=0).T)
 
-        for dimension in range(3):
-            velocity_data.append(np.diff(sliced_freemocap_data[:,dimension]))
-        # x_velocity_data = np.diff(sliced_freemocap_data[:,0])
-        # y_velocity_data = np.diff(sliced_freemocap_data[:,1])
+        return velocity_data 
 
-        return velocity_data 
\ No newline at end of file
+    def get_sway_metrics(self, condition_dictionary:dict, sampling_rate:float = 30):
+        """Path length, velocity, RMS sway, confidence ellipse and frequency metrics for every condition at once (see calculate_sway_metrics).
+        Condition frames are sliced the same way as slice_data, so normalized_path_length matches get_path_length"""
+        sliced_condition_dictionary = {condition: [frame_interval[0], frame_interval[1] - 1] for condition, frame_interval in condition_dictionary.items()}
+        return calculate_sway_metrics(self.freemocap_data, sliced_condition_dictionary, sampling_rate=sampling_rate)
\ No newline at end of file
@@ -48,9 +48,12 @@ class FrameSelectorWidget(QWidget):
 
 
     def _slice_data(self,start_end_frames_new:list):
+        #views into the original data, nothing downstream writes to them so there's no need to copy
+        self.qualisys_data_sliced = self.qualisys_data[start_end_frames_new[0]:start_end_frames_new[1],:,:]
+        self.freemocap_data_sliced = self.freemocap_data[start_end_frames_new[0]:start_end_frames_new[1],:,:]
 
-        self.qualisys_data_sliced = self.qualisys_data[start_end_frames_new[0]:start_end_frames_new[1],:,:].copy()
-        self.freemocap_data_sliced = self.freemocap_data[start_end_frames_new[0]:start_end_frames_new[1],:,:].copy()
+    def get_frame_interval(self):
+        return self.start_end_frames_new
 
     def get_sliced_qualisys_data(self):
         return self.qualisys_data_sliced
@@ -53,9 +53,12 @@ class RMSEViewWidget(QWidget):
         return fig, self.ax_list
 
     def update_plot(self,qualisys_data:np.ndarray,freemocap_data:np.ndarray):
+        rmse_dataframe = calculate_rmse_dataframe(qualisys_data=qualisys_data, freemocap_data=freemocap_data)
+        self.plot_rmse_dataframe(rmse_dataframe)
+
+    def plot_rmse_dataframe(self, rmse_dataframe:pd.DataFrame):
 
         dimension_list = ['x', 'y', 'z']
-        rmse_dataframe = calculate_rmse_dataframe(qualisys_data=qualisys_data, freemocap_data=freemocap_data)
 
         for (dimension,ax) in zip(dimension_list, self.ax_list):
             ax.cla()
@@ -0,0 +1,82 @@
+
+from PyQt6.QtWidgets import QWidget,QPushButton,QVBoxLayout,QLineEdit,QFormLayout,QLabel
+from PyQt6.QtGui import QIntValidator
+
+import matplotlib
+matplotlib.use('Qt5Agg')
+
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg, NavigationToolbar2QT as NavigationToolbar
+from matplotlib.figure import Figure
+
+from freemocap_utils.rmse_calculation import RMSEPrefixSums
+
+import numpy as np
+
+class SlidingWindowRMSEPlots(FigureCanvasQTAgg):
+
+    def __init__(self, parent=None, width=15, height=4, dpi=100):
+        fig = Figure(figsize=(width, height), dpi=dpi)
+        self.x_ax = fig.add_subplot(311)
+        self.y_ax = fig.add_subplot(312)
+        self.z_ax = fig.add_subplot(313)
+
+        super(SlidingWindowRMSEPlots, self).__init__(fig)
+
+class SlidingWindowRMSEWidget(QWidget):
+    """Plots the RMSE (averaged over the shared markers) in a window slid across the recording, to spot drift over time"""
+
+    def __init__(self, rmse_prefix_sums:RMSEPrefixSums, window_size:int = 300):
+        super().__init__()
+
+        self.rmse_prefix_sums = rmse_prefix_sums
+        self.reference_frame = None
+
+        self._layout = QVBoxLayout()
+        self.setLayout(self._layout)
+
+        self.fig, self.ax_list = self.initialize_sliding_window_plot()
+
+        toolbar = NavigationToolbar(self.fig, self)
+
+        self._layout.addWidget(toolbar)
+        self._layout.addWidget(self.fig)
+
+        self.window_size_line = QLineEdit()
+        self.window_size_line.setValidator(QIntValidator(1, 10**9))
+        self.window_size_line.setFixedWidth(100)
+        self.window_size_line.setText(str(window_size))
+
+        window_form = QFormLayout()
+        window_form.addRow(QLabel('Window Size (frames)'), self.window_size_line)
+        self._layout.addLayout(window_form)
+
+        self.submitButton = QPushButton('Update Sliding Window RMSE')
+        self.submitButton.pressed.connect(self.update_plot)
+        self._layout.addWidget(self.submitButton)
+
+    def initialize_sliding_window_plot(self):
+        fig = SlidingWindowRMSEPlots(self, width=15, height=10, dpi=100)
+        self.x_ax = fig.figure.axes[0]
+        self.y_ax = fig.figure.axes[1]
+        self.z_ax = fig.figure.axes[2]
+
+        self.ax_list = [self.x_ax,self.y_ax,self.z_ax]
+        return fig, self.ax_list
+
+    def set_reference_frame(self, reference_frame):
+        self.reference_frame = reference_frame
+        self.update_plot()
+
+    def update_plot(self):
+        window_size = int(self.window_size_line.text())
+        window_starts, sliding_window_rmse = self.rmse_prefix_sums.calculate_sliding_window_rmse(window_size, reference_frame=self.reference_frame)
+        mean_sliding_window_rmse = np.nanmean(sliding_window_rmse, axis=1)
+
+        for dimension, (dimension_name, ax) in enumerate(zip(['x', 'y', 'z'], self.ax_list)):
+            ax.cla()
+            ax.plot(window_starts, mean_sliding_window_rmse[:, dimension], label = f'{window_size} frame window', alpha = .7)
+            ax.set_ylabel(f'rmse {dimension_name}')
+            ax.legend()
+
+        self.ax_list[-1].set_xlabel('Window Start Frame')
+        self.fig.figure.canvas.draw_idle()
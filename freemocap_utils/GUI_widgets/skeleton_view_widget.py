@@ -1,4 +1,4 @@
-from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtCore import pyqtSignal, QTimer
 from PyQt6.QtWidgets import QWidget,QFileDialog,QPushButton,QVBoxLayout
 
 import matplotlib
@@ -6,11 +6,12 @@ matplotlib.use('Qt5Agg')
 
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib.figure import Figure
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
 
 from pathlib import Path
 import numpy as np
 
-from freemocap_utils.mediapipe_skeleton_builder import mediapipe_indices,mediapipe_connections,build_skeleton
+from freemocap_utils.mediapipe_skeleton_builder import mediapipe_indices,mediapipe_connections,build_skeleton_array
 
 
 class SkeletonViewWidget(QWidget):
@@ -31,6 +32,12 @@ class SkeletonViewWidget(QWidget):
         self._layout.addWidget(self.fig)
 
         self.session_folder_path = None
+
+        #slider moves only store the frame, the artists are redrawn at most once per screen refresh
+        self.frame_to_draw = 0
+        self.redraw_timer = QTimer(self)
+        self.redraw_timer.setSingleShot(True)
+        self.redraw_timer.timeout.connect(self.update_skeleton_artists)
         
 
     # def open_folder_dialog(self):
@@ -53,7 +60,7 @@ class SkeletonViewWidget(QWidget):
     #     self.skeleton_3d_data = np.load(skeleton_data_folder_path)
 
 
-    #     self.mediapipe_skeleton = build_skeleton(self.skeleton_3d_data,mediapipe_indices,mediapipe_connections)
+    #     self.skeleton_bones_array = build_skeleton_array(self.skeleton_3d_data,mediapipe_indices,mediapipe_connections)
 
     #     self.num_frames = self.skeleton_3d_data.shape[0]
     #     # self.reset_slider()
@@ -65,14 +72,21 @@ class SkeletonViewWidget(QWidget):
         ax = fig.figure.axes[0]
         return fig, ax
 
-    def reset_skeleton_3d_plot(self,skeleton_3d_data:np.ndarray, mediapipe_skeleton):
+    def reset_skeleton_3d_plot(self,skeleton_3d_data:np.ndarray, skeleton_bones_array:np.ndarray):
+        """skeleton_bones_array is the (frames, connections, 2, 3) array from build_skeleton_array"""
         self.skeleton_3d_data = skeleton_3d_data
-        self.mediapipe_skeleton = mediapipe_skeleton
+        self.skeleton_bones_array = skeleton_bones_array
         self.ax.cla()
         self.calculate_axes_means(self.skeleton_3d_data)
+        self.set_redraw_interval()
         self.skel_x,self.skel_y,self.skel_z = self.get_x_y_z_data(0)
         self.plot_skel(0,self.skel_x,self.skel_y,self.skel_z)
 
+    def set_redraw_interval(self):
+        screen = self.screen()
+        refresh_rate = screen.refreshRate() if screen is not None and screen.refreshRate() > 0 else 60
+        self.redraw_timer.setInterval(max(1, int(1000/refresh_rate)))
+
 
     # def reset_slider(self):
     #     self.slider_max = self.num_frames -1
@@ -86,7 +100,8 @@ class SkeletonViewWidget(QWidget):
         self.skel_3d_range = 900
 
     def plot_skel(self,frame_number,skel_x,skel_y,skel_z):
-        self.ax.scatter(skel_x,skel_y,skel_z)
+        #the scatter and the bone collection are created once here and only have their data swapped in replot
+        self.skeleton_scatter = self.ax.scatter(skel_x,skel_y,skel_z)
         self.plot_skeleton_bones(frame_number)
         self.ax.set_xlim([self.mx_skel-self.skel_3d_range, self.mx_skel+self.skel_3d_range])
         self.ax.set_ylim([self.my_skel-self.skel_3d_range, self.my_skel+self.skel_3d_range])
@@ -95,14 +110,10 @@ class SkeletonViewWidget(QWidget):
         self.fig.figure.canvas.draw_idle()
 
     def plot_skeleton_bones(self,frame_number):
-        this_frame_skeleton_data = self.mediapipe_skeleton[frame_number]
-        for connection in this_frame_skeleton_data.keys():
-            line_start_point = this_frame_skeleton_data[connection][0] 
-            line_end_point = this_frame_skeleton_data[connection][1]
-            
-            bone_x,bone_y,bone_z = [line_start_point[0],line_end_point[0]],[line_start_point[1],line_end_point[1]],[line_start_point[2],line_end_point[2]] 
-
-            self.ax.plot(bone_x,bone_y,bone_z)
+        num_connections = self.skeleton_bones_array.shape[1]
+        bone_colors = [f'C{connection_number%10}' for connection_number in range(num_connections)]
+        self.skeleton_bones = Line3DCollection(self.skeleton_bones_array[frame_number], colors = bone_colors)
+        self.ax.add_collection3d(self.skeleton_bones)
 
     def get_x_y_z_data(self, frame_number:int):
         skel_x = self.skeleton_3d_data[frame_number,:,0]
@@ -112,11 +123,17 @@ class SkeletonViewWidget(QWidget):
         return skel_x,skel_y,skel_z
 
     def replot(self, frame_number:int):
-        skel_x,skel_y,skel_z = self.get_x_y_z_data(frame_number)
-        self.ax.cla()
-        self.plot_skel(frame_number,skel_x,skel_y,skel_z)
+        self.frame_to_draw = frame_number
+        if not self.redraw_timer.isActive():
+            self.redraw_timer.start()
         #self.label.setText(str(frame_number))
 
+    def update_skeleton_artists(self):
+        skel_x,skel_y,skel_z = self.get_x_y_z_data(self.frame_to_draw)
+        self.skeleton_scatter._offsets3d = (skel_x,skel_y,skel_z)
+        self.skeleton_bones.set_segments(self.skeleton_bones_array[self.frame_to_draw])
+        self.fig.figure.canvas.draw_idle()
+
 
 class Mpl3DPlotCanvas(FigureCanvasQTAgg):
 
@@ -6,8 +6,10 @@ from pathlib import Path
 import numpy as np
 
 class FreeMoCapDataLoader():
-    def __init__(self, path_to_session_folder:Path):
+    def __init__(self, path_to_session_folder:Path, mmap_mode:str = None):
+        """mmap_mode is passed on to np.load (e.g. 'r'), to memory-map long recordings rather than reading them into memory"""
         self.path_to_session_folder = path_to_session_folder
+        self.mmap_mode = mmap_mode
 
     # def load_mediapipe_body_data(self):
     #     self.path_to_mediapipe_body_data = self.path_to_session_folder/DATA_FOLDER_NAME/MEDIAPIPE_3D_BODY_FILE_NAME
@@ -16,12 +18,12 @@ class FreeMoCapDataLoader():
 
     def load_mediapipe_body_data(self):
         self.path_to_mediapipe_body_data = self.path_to_session_folder/'output_data'/'mediapipe_body_3d_xyz_transformed.npy'
-        mediapipe_body_data = np.load(self.path_to_mediapipe_body_data)
+        mediapipe_body_data = np.load(self.path_to_mediapipe_body_data, mmap_mode=self.mmap_mode)
         return mediapipe_body_data
 
     def load_total_body_COM_data(self):
         self.path_to_total_body_COM_data = self.path_to_session_folder/DATA_FOLDER_NAME/'center_of_mass'/TOTAL_BODY_CENTER_OF_MASS_NPY_FILE_NAME
-        total_body_COM_data = np.load(self.path_to_total_body_COM_data)
+        total_body_COM_data = np.load(self.path_to_total_body_COM_data, mmap_mode=self.mmap_mode)
         return total_body_COM_data
 
 
@@ -125,6 +125,19 @@ def build_skeleton(skel_3d_data:np.ndarray,pose_estimation_markers:list,pose_est
     f = 2
 
 
+def get_connection_indices(pose_estimation_markers:list,pose_estimation_connections:dict) -> np.ndarray:
+    """Look up the marker index of both ends of every connection once, as a (connections, 2) array"""
+    marker_to_index = {marker_name:index for index,marker_name in enumerate(pose_estimation_markers)}
+    return np.array([[marker_to_index[connection[0]],marker_to_index[connection[1]]] for connection in pose_estimation_connections.values()], dtype = np.intp)
+
+
+def build_skeleton_array(skel_3d_data:np.ndarray,pose_estimation_markers:list,pose_estimation_connections:dict) -> np.ndarray:
+    """Array version of build_skeleton: a (frames, connections, 2, 3) array of the start and end point of every connection,
+    in the order of pose_estimation_connections, gathered for the whole recording with one fancy index"""
+    connection_indices = get_connection_indices(pose_estimation_markers,pose_estimation_connections)
+    return skel_3d_data[:,connection_indices,:]
+
+
 if __name__ == '__main__':
     freemocap_data_folder_path = Path(r'D:\freemocap2022\FreeMocap_Data')
     sessionID = 'sesh_2022-09-29_17_29_31'
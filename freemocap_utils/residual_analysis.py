@@ -0,0 +1,115 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks
+from scipy.stats import linregress
+
+from freemocap_utils.skeleton_filtering import filter_skeleton_data
+
+# set once in each pool worker by _init_residual_worker, so the skeleton data is sent to a worker once instead of with every cutoff
+_worker_filter_arguments = {}
+
+
+def calculate_residuals_for_cutoff(cutoff:float, skeleton_3d_data:np.ndarray, sampling_rate:float, order:int) -> np.ndarray:
+    """ Filter every marker and axis at one cutoff and return the RMS residual between the original and filtered data, shape (markers, 3)"""
+    filtered_data = filter_skeleton_data(skeleton_3d_data, cutoff, sampling_rate, order)
+    return np.sqrt(np.nanmean((skeleton_3d_data - filtered_data)**2, axis=0))
+
+
+def _init_residual_worker(skeleton_3d_data:np.ndarray, sampling_rate:float, order:int):
+    _worker_filter_arguments.update(skeleton_3d_data=skeleton_3d_data, sampling_rate=sampling_rate, order=order)
+
+
+def _calculate_worker_residuals_for_cutoff(cutoff:float) -> np.ndarray:
+    return calculate_residuals_for_cutoff(cutoff, **_worker_filter_arguments)
+
+
+def calculate_residual_curves(skeleton_3d_data:np.ndarray, sampling_rate:float, order:int, cutoff_range:np.ndarray, num_workers:int = None) -> np.ndarray:
+    """ Sweep the cutoff grid for every marker and axis of a (frames, markers, 3) array at once.
+    Each cutoff is a single batched filter call over the whole array. If num_workers is set, the cutoffs are split into one chunk per worker
+    of a process pool, and the array is sent to each worker once when it starts.
+    Returns the residuals as a (cutoffs, markers, 3) array"""
+    if num_workers is None or num_workers <= 1:
+        residuals = [calculate_residuals_for_cutoff(cutoff, skeleton_3d_data, sampling_rate, order) for cutoff in cutoff_range]
+    else:
+        chunksize = max(1, math.ceil(len(cutoff_range) / num_workers))
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_residual_worker, initargs=(skeleton_3d_data, sampling_rate, order)) as executor:
+            residuals = list(executor.map(_calculate_worker_residuals_for_cutoff, cutoff_range, chunksize=chunksize))
+
+    return np.stack(residuals, axis=0)
+
+
+def find_flattening_point(residuals:np.ndarray, peak_number:int = 2):
+    """ Find where the residual curve flattens out, using the peaks in its second derivative. Returns None if there aren't enough peaks"""
+    second_derivative = np.diff(residuals, n=2)
+    peaks, _ = find_peaks(second_derivative)
+    if len(peaks) > peak_number:
+        return peaks[peak_number]
+    return None
+
+
+def find_optimal_cutoff_from_residuals(cutoff_range:np.ndarray, residuals:np.ndarray) -> dict:
+    """ Fit a regression line to the flat tail of a single residual curve and pick the highest cutoff whose residual is still above the line's intercept.
+    Returns a dictionary with the optimal cutoff and the pieces needed to plot the analysis (NaN/None if the curve never flattens)"""
+    cutoff_range = np.asarray(cutoff_range)
+    result = {'optimal_cutoff': np.nan, 'flattening_index': None, 'slope': np.nan, 'intercept': np.nan}
+
+    flattening_index = find_flattening_point(residuals)
+    if flattening_index is None:
+        return result
+
+    slope, intercept, _, _, _ = linregress(cutoff_range[flattening_index:], residuals[flattening_index:])
+    result.update(flattening_index=flattening_index, slope=slope, intercept=intercept)
+
+    above_threshold = np.flatnonzero(residuals > intercept)
+    if above_threshold.size > 0:
+        result['optimal_cutoff'] = cutoff_range[above_threshold[-1]]
+
+    return result
+
+
+def find_optimal_cutoffs(skeleton_3d_data:np.ndarray, sampling_rate:float, order:int, cutoff_range:np.ndarray, marker_names:list = None, num_workers:int = None):
+    """ Run a residual analysis on every marker and axis of a (frames, markers, 3) array.
+    Returns a dataframe of the optimal cutoff for each marker (rows) and axis (columns x, y, z) along with the (cutoffs, markers, 3) residual curves"""
+    cutoff_range = np.asarray(cutoff_range)
+    residual_curves = calculate_residual_curves(skeleton_3d_data, sampling_rate, order, cutoff_range, num_workers=num_workers)
+
+    num_markers = residual_curves.shape[1]
+    optimal_cutoffs = np.full((num_markers, 3), np.nan)
+    for marker in range(num_markers):
+        for dimension in range(3):
+            optimal_cutoffs[marker, dimension] = find_optimal_cutoff_from_residuals(cutoff_range, residual_curves[:, marker, dimension])['optimal_cutoff']
+
+    optimal_cutoff_dataframe = pd.DataFrame(optimal_cutoffs, columns=['x', 'y', 'z'], index=marker_names)
+    optimal_cutoff_dataframe.index.name = 'marker'
+
+    return optimal_cutoff_dataframe, residual_curves
+
+
+def plot_residual_analysis(cutoff_range:np.ndarray, residuals:np.ndarray, ax = None, title:str = 'RMSE vs. Cutoff Frequency'):
+    """ Plot a single residual curve along with its tail regression line, threshold and chosen cutoff"""
+    import matplotlib.pyplot as plt
+
+    cutoff_range = np.asarray(cutoff_range)
+    if ax is None:
+        ax = plt.figure().add_subplot(111)
+
+    ax.plot(cutoff_range, residuals, 'b', label='RMSE')
+    ax.set_xlabel('Cutoff Frequency (Hz)')
+    ax.set_ylabel('RMSE')
+    ax.set_title(title)
+
+    result = find_optimal_cutoff_from_residuals(cutoff_range, residuals)
+    flattening_index = result['flattening_index']
+    if flattening_index is not None:
+        tail_cutoff_range = cutoff_range[flattening_index:]
+        regression_line = result['slope'] * tail_cutoff_range + result['intercept']
+        ax.plot(tail_cutoff_range, regression_line, 'gray', linestyle='--', label='Regression Line')
+        ax.plot([0, tail_cutoff_range[-1]], [result['intercept'], regression_line[-1]], 'gray', linestyle='--')
+        ax.axhline(y=result['intercept'], color='r', linestyle='--', label='Threshold')
+        ax.plot(cutoff_range[flattening_index], residuals[flattening_index], 'go', label='Tail End Start')
+
+    ax.legend()
+    return ax, result
@@ -0,0 +1,156 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+DIMENSION_LIST = ['x', 'y', 'z']
+
+
+class MarkerCorrespondence:
+    """ The markers shared by a FreeMoCap and a Qualisys marker set, with the index of each one in both arrays.
+    Built once per pair of marker lists (see get_marker_correspondence) so the name lookups aren't repeated on every RMSE calculation"""
+
+    def __init__(self, freemocap_marker_names:list, qualisys_marker_names:list):
+        qualisys_marker_index = {marker_name: index for index, marker_name in enumerate(qualisys_marker_names)}
+
+        #shared markers are kept in the FreeMoCap marker order
+        self.marker_names = [marker_name for marker_name in freemocap_marker_names if marker_name in qualisys_marker_index]
+        self.freemocap_indices = np.array([freemocap_marker_names.index(marker_name) for marker_name in self.marker_names], dtype=np.intp)
+        self.qualisys_indices = np.array([qualisys_marker_index[marker_name] for marker_name in self.marker_names], dtype=np.intp)
+
+    @property
+    def num_markers(self):
+        return len(self.marker_names)
+
+    def select_shared_markers(self, qualisys_data:np.ndarray, freemocap_data:np.ndarray):
+        """ Gather the shared markers from both (frames, markers, 3) arrays so marker i is the same in both"""
+        return qualisys_data[:, self.qualisys_indices, :], freemocap_data[:, self.freemocap_indices, :]
+
+
+@lru_cache(maxsize=None)
+def _get_marker_correspondence(freemocap_marker_names:tuple, qualisys_marker_names:tuple) -> MarkerCorrespondence:
+    return MarkerCorrespondence(list(freemocap_marker_names), list(qualisys_marker_names))
+
+
+def get_marker_correspondence(freemocap_marker_names:list, qualisys_marker_names:list) -> MarkerCorrespondence:
+    """ Returns the (cached) correspondence for this pair of marker lists"""
+    return _get_marker_correspondence(tuple(freemocap_marker_names), tuple(qualisys_marker_names))
+
+
+def calculate_squared_errors(qualisys_data:np.ndarray, freemocap_data:np.ndarray, correspondence:MarkerCorrespondence) -> np.ndarray:
+    """ Squared error for every frame, shared marker and dimension, shape (frames, shared markers, 3). NaN where either system is missing data"""
+    shared_qualisys_data, shared_freemocap_data = correspondence.select_shared_markers(qualisys_data, freemocap_data)
+    return (shared_qualisys_data - shared_freemocap_data)**2
+
+
+def _nan_root_mean(squared_errors:np.ndarray, axis) -> np.ndarray:
+    valid_mask = ~np.isnan(squared_errors)
+    sum_squared_errors = np.where(valid_mask, squared_errors, 0).sum(axis=axis)
+    num_valid = valid_mask.sum(axis=axis)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(num_valid > 0, np.sqrt(sum_squared_errors / num_valid), np.nan)
+
+
+def calculate_rmse_array(qualisys_data:np.ndarray, freemocap_data:np.ndarray, correspondence:MarkerCorrespondence) -> np.ndarray:
+    """ RMSE over all frames for every shared marker and dimension, shape (shared markers, 3). Frames with NaNs are left out"""
+    return _nan_root_mean(calculate_squared_errors(qualisys_data, freemocap_data, correspondence), axis=0)
+
+
+def calculate_rmse_per_frame(qualisys_data:np.ndarray, freemocap_data:np.ndarray, correspondence:MarkerCorrespondence) -> np.ndarray:
+    """ RMSE across the shared markers for every frame and dimension, shape (frames, 3)"""
+    return _nan_root_mean(calculate_squared_errors(qualisys_data, freemocap_data, correspondence), axis=1)
+
+
+def calculate_rmse_per_window(qualisys_data:np.ndarray, freemocap_data:np.ndarray, correspondence:MarkerCorrespondence, window_size:int) -> np.ndarray:
+    """ RMSE for every shared marker and dimension in consecutive, non-overlapping windows of window_size frames.
+    A leftover partial window at the end is included. Shape (windows, shared markers, 3)"""
+    squared_errors = calculate_squared_errors(qualisys_data, freemocap_data, correspondence)
+    window_starts = np.arange(0, squared_errors.shape[0], window_size)
+
+    valid_mask = ~np.isnan(squared_errors)
+    window_sums = np.add.reduceat(np.where(valid_mask, squared_errors, 0), window_starts, axis=0)
+    window_counts = np.add.reduceat(valid_mask.astype(np.int64), window_starts, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(window_counts > 0, np.sqrt(window_sums / window_counts), np.nan)
+
+
+def calculate_rmse_per_condition(qualisys_data:np.ndarray, freemocap_data:np.ndarray, correspondence:MarkerCorrespondence, condition_frame_intervals:dict) -> pd.DataFrame:
+    """ RMSE for every shared marker and dimension within each condition's [start, end) frame interval.
+    condition_frame_intervals is a dictionary of condition name to [start frame, end frame].
+    Returns a long dataframe with 'condition', 'marker', 'dimension' and 'rmse' columns"""
+    squared_errors = calculate_squared_errors(qualisys_data, freemocap_data, correspondence)
+
+    condition_dataframes = []
+    for condition_name, (start_frame, end_frame) in condition_frame_intervals.items():
+        condition_rmse = _nan_root_mean(squared_errors[start_frame:end_frame], axis=0)
+        condition_dataframe = rmse_array_to_dataframe(condition_rmse, correspondence.marker_names)
+        condition_dataframe.insert(0, 'condition', condition_name)
+        condition_dataframes.append(condition_dataframe)
+
+    if not condition_dataframes:
+        return pd.DataFrame(columns=['condition', 'marker', 'rmse', 'dimension'])
+    return pd.concat(condition_dataframes, ignore_index=True)
+
+
+def rmse_array_to_dataframe(rmse_array:np.ndarray, marker_names:list) -> pd.DataFrame:
+    """ Turn a (markers, 3) RMSE array into the long dataframe (marker, rmse, dimension) used by the RMSE plots.
+    Rows are in the same order the old per-marker loop produced (last marker first)"""
+    num_markers = len(marker_names)
+    reversed_rmse_array = rmse_array[::-1]
+    return pd.DataFrame(
+        {
+            'marker': np.repeat(np.asarray(marker_names[::-1], dtype=object), 3),
+            'rmse': reversed_rmse_array.reshape(-1),
+            'dimension': DIMENSION_LIST * num_markers,
+        },
+        index=np.tile(np.arange(3), num_markers),
+    )
+
+
+class RMSEPrefixSums:
+    """ Cumulative sums of the FreeMoCap/Qualisys differences for every shared marker and dimension, computed once after loading.
+
+    With d the Qualisys - FreeMoCap difference, the RMSE of any [start, end) window is an O(1) lookup into the cumulative sums of
+    d, d^2 and the number of valid frames. Zeroing both systems to a reference frame r changes the error to d - d[r], and
+    sum((d - d[r])^2) = sum(d^2) - 2*d[r]*sum(d) + n*d[r]^2, so re-referencing doesn't need the arrays to be rebuilt either"""
+
+    def __init__(self, qualisys_data:np.ndarray, freemocap_data:np.ndarray, correspondence:MarkerCorrespondence):
+        self.correspondence = correspondence
+
+        shared_qualisys_data, shared_freemocap_data = correspondence.select_shared_markers(qualisys_data, freemocap_data)
+        self.differences = shared_qualisys_data - shared_freemocap_data
+        self.num_frames = self.differences.shape[0]
+
+        valid_mask = ~np.isnan(self.differences)
+        valid_differences = np.where(valid_mask, self.differences, 0)
+
+        zero_row = np.zeros((1,) + self.differences.shape[1:])
+        self.cumulative_differences = np.concatenate([zero_row, np.cumsum(valid_differences, axis=0)])
+        self.cumulative_squared_differences = np.concatenate([zero_row, np.cumsum(valid_differences**2, axis=0)])
+        self.cumulative_valid_counts = np.concatenate([zero_row.astype(np.int64), np.cumsum(valid_mask, axis=0)])
+
+    def calculate_rmse(self, start_frame, end_frame, reference_frame:int = None) -> np.ndarray:
+        """ RMSE over [start_frame, end_frame) for every shared marker and dimension, shape (shared markers, 3).
+        If reference_frame is given, both systems are zeroed to that frame first. start_frame and end_frame can also be
+        equal length arrays of frames, which gives one RMSE per window, shape (windows, shared markers, 3)"""
+        start_frame = np.clip(start_frame, 0, self.num_frames)
+        end_frame = np.clip(end_frame, start_frame, self.num_frames)
+
+        sum_squared_differences = self.cumulative_squared_differences[end_frame] - self.cumulative_squared_differences[start_frame]
+        num_valid = self.cumulative_valid_counts[end_frame] - self.cumulative_valid_counts[start_frame]
+
+        if reference_frame is not None:
+            reference_difference = self.differences[reference_frame]
+            sum_differences = self.cumulative_differences[end_frame] - self.cumulative_differences[start_frame]
+            sum_squared_differences = sum_squared_differences - 2*reference_difference*sum_differences + num_valid*reference_difference**2
+
+        #the subtraction can leave tiny negative values from rounding
+        sum_squared_differences = np.maximum(sum_squared_differences, 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(num_valid > 0, np.sqrt(sum_squared_differences / num_valid), np.nan)
+
+    def calculate_sliding_window_rmse(self, window_size:int, step:int = 1, reference_frame:int = None):
+        """ RMSE in a window of window_size frames slid across the whole recording, for spotting drift.
+        Returns the starting frame of each window and the (windows, shared markers, 3) RMSE"""
+        window_starts = np.arange(0, max(self.num_frames - window_size, 0) + 1, step)
+        return window_starts, self.calculate_rmse(window_starts, window_starts + window_size, reference_frame=reference_frame)
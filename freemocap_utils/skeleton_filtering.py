@@ -0,0 +1,58 @@
+from functools import lru_cache
+
+import numpy as np
+from scipy import signal
+
+from freemocap_utils.skeleton_interpolation import find_nan_runs
+
+
+@lru_cache(maxsize=None)
+def get_butterworth_sos(cutoff:float, sampling_rate:float, order:int) -> np.ndarray:
+    """ Design a low pass butterworth filter as second-order sections. The coefficients are cached, so each (cutoff, sampling_rate, order) is only designed once"""
+    nyquist_freq = 0.5*sampling_rate
+    normal_cutoff = cutoff / nyquist_freq
+    sos = signal.butter(order, normal_cutoff, btype='low', analog=False, output='sos')
+    return sos
+
+
+def get_minimum_filterable_length(sos:np.ndarray) -> int:
+    """ The shortest run of data that sosfiltfilt can filter with its default padding"""
+    padlen = 3 * (2 * len(sos) + 1 - min((sos[:, 2] == 0).sum(), (sos[:, 5] == 0).sum()))
+    return padlen + 1
+
+
+def butter_lowpass_filter(data:np.ndarray, cutoff:float, sampling_rate:float, order:int, axis:int = 0) -> np.ndarray:
+    """ Run a zero-phase low pass butterworth filter along one axis of the data (the frame axis by default)"""
+    sos = get_butterworth_sos(cutoff, sampling_rate, order)
+    return signal.sosfiltfilt(sos, data, axis=axis)
+
+
+def filter_skeleton_data(skeleton_3d_data:np.ndarray, cutoff:float, sampling_rate:float, order:int) -> np.ndarray:
+    """ Take in a 3d skeleton numpy array (frames, markers, 3) and run a zero-phase low pass butterworth filter on every marker and axis.
+
+    Columns without NaNs are all filtered together in a single sosfiltfilt call along the frame axis. Columns with NaNs are filtered
+    one contiguous run of valid data at a time, and the NaNs are left in place. Runs that are too short to filter are left unfiltered."""
+    num_frames = skeleton_3d_data.shape[0]
+    sos = get_butterworth_sos(cutoff, sampling_rate, order)
+
+    data_2d = np.asarray(skeleton_3d_data, dtype=np.float64).reshape(num_frames, -1)
+    filtered_data = np.empty_like(data_2d)
+
+    valid_mask = np.isfinite(data_2d)
+    complete_columns = valid_mask.all(axis=0)
+
+    if complete_columns.any():
+        filtered_data[:, complete_columns] = signal.sosfiltfilt(sos, data_2d[:, complete_columns], axis=0)
+
+    if not complete_columns.all():
+        incomplete_columns = np.flatnonzero(~complete_columns)
+        filtered_data[:, incomplete_columns] = data_2d[:, incomplete_columns]
+
+        minimum_length = get_minimum_filterable_length(sos)
+        run_columns, run_starts, run_lengths = find_nan_runs(valid_mask[:, incomplete_columns])
+        for column, start, length in zip(incomplete_columns[run_columns], run_starts, run_lengths):
+            if length < minimum_length:
+                continue
+            filtered_data[start:start+length, column] = signal.sosfiltfilt(sos, data_2d[start:start+length, column])
+
+    return filtered_data.reshape(skeleton_3d_data.shape)
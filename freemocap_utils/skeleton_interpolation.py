@@ -1,33 +1,130 @@
 
 
+
 import numpy as np      
-import pandas as pd
-from rich.progress import track
+from scipy.interpolate import CubicSpline, PchipInterpolator
+
+INTERPOLATION_METHODS = ['linear', 'cubic', 'pchip']
+
+
+def find_nan_runs(missing_mask:np.ndarray):
+    """ Run-length encodes the missing values in a (frames, columns) boolean array along the frame axis.
+    Returns the column, starting frame and length of every run of missing values, sorted by column then frame"""
+    num_columns = missing_mask.shape[1]
+    padding = np.zeros((1, num_columns), dtype=np.int8)
+    edges = np.diff(np.concatenate([padding, missing_mask.astype(np.int8), padding], axis=0), axis=0)
+
+    run_columns, run_starts = np.nonzero(edges.T == 1)
+    _, run_ends = np.nonzero(edges.T == -1)
+
+    return run_columns, run_starts, run_ends - run_starts
+
+
+def build_gap_report(missing_mask:np.ndarray, unfilled_mask:np.ndarray) -> dict:
+    """ Summarizes the gaps for each marker from (frames, markers, 3) masks. A frame counts as missing for a marker if any of its axes is missing"""
+    num_markers = missing_mask.shape[1]
+    marker_missing_mask = missing_mask.any(axis=2)
+
+    run_markers, _, run_lengths = find_nan_runs(marker_missing_mask)
+
+    longest_gap = np.zeros(num_markers, dtype=int)
+    np.maximum.at(longest_gap, run_markers, run_lengths)
+
+    return {
+        'gap_count': np.bincount(run_markers, minlength=num_markers),
+        'longest_gap': longest_gap,
+        'missing_frames': marker_missing_mask.sum(axis=0),
+        'unfilled_frames': unfilled_mask.any(axis=2).sum(axis=0),
+    }
+
+
+def interpolate_marker_gaps(freemocap_marker_data:np.ndarray, method:str = 'linear', max_gap_length:int = None, fill_remaining_with_mean:bool = True, out:np.ndarray = None):
+    """ Fills the NaN gaps in a (frames, markers, 3) array in one pass over the whole array.
+
+    Gaps with valid data on both sides are filled with the chosen method ('linear', 'cubic' or 'pchip'), and gaps at the
+    end of the recording hold the last valid value, the same as the pandas interpolation used in interpolate_freemocap_data.
+    Gaps longer than max_gap_length frames are left alone (they stay NaN and show up as unfilled in the gap report).
+    If fill_remaining_with_mean is True, the NaN values at the start of the recording (before the first valid frame) are
+    replaced with the mean of that marker, like interpolate_freemocap_data does.
+
+    The result is written into out if it is given (it can be the input array itself), otherwise a new array is allocated.
+    Returns the interpolated array and a per-marker gap report (see build_gap_report)"""
+    if method not in INTERPOLATION_METHODS:
+        raise ValueError(f'Interpolation method {method} is not one of {INTERPOLATION_METHODS}')
+
+    num_frames, num_markers, num_axes = freemocap_marker_data.shape
+    if out is None:
+        out = np.empty((num_frames, num_markers, num_axes))
+    if out.shape != freemocap_marker_data.shape:
+        raise ValueError(f'Output buffer shape {out.shape} does not match the marker data shape {freemocap_marker_data.shape}')
+
+    marker_data = freemocap_marker_data.reshape(num_frames, -1)
+    missing_mask = ~np.isfinite(marker_data)
+
+    #index of the last valid frame at or before each frame (-1 if none) and of the next valid frame at or after it (num_frames if none)
+    frame_numbers = np.arange(num_frames)[:, None]
+    previous_valid_frame = np.maximum.accumulate(np.where(missing_mask, -1, frame_numbers), axis=0)
+    next_valid_frame = np.minimum.accumulate(np.where(missing_mask, num_frames, frame_numbers)[::-1], axis=0)[::-1]
+
+    gap_length = next_valid_frame - previous_valid_frame - 1
+    is_interior_gap = missing_mask & (previous_valid_frame >= 0) & (next_valid_frame < num_frames)
+    is_trailing_gap = missing_mask & (previous_valid_frame >= 0) & (next_valid_frame == num_frames)
+    is_leading_gap = missing_mask & (previous_valid_frame < 0)
+    if max_gap_length is not None:
+        is_interior_gap &= gap_length <= max_gap_length
+        is_trailing_gap &= gap_length <= max_gap_length
+
+    fill_frames, fill_columns = np.nonzero(is_interior_gap)
+    if method == 'linear':
+        previous_frames = previous_valid_frame[fill_frames, fill_columns]
+        next_frames = next_valid_frame[fill_frames, fill_columns]
+        previous_values = marker_data[previous_frames, fill_columns]
+        next_values = marker_data[next_frames, fill_columns]
+        fraction = (fill_frames - previous_frames) / (next_frames - previous_frames)
+        fill_values = previous_values + fraction * (next_values - previous_values)
+    else:
+        fill_values = np.empty(fill_frames.shape[0])
+        interpolator_class = CubicSpline if method == 'cubic' else PchipInterpolator
+        for column in np.unique(fill_columns):
+            this_column_fill = fill_columns == column
+            this_column_valid = ~missing_mask[:, column]
+            if this_column_valid.sum() < 2:
+                fill_values[this_column_fill] = np.nan
+                continue
+            interpolator = interpolator_class(np.flatnonzero(this_column_valid), marker_data[this_column_valid, column])
+            fill_values[this_column_fill] = interpolator(fill_frames[this_column_fill])
+
+    trailing_frames, trailing_columns = np.nonzero(is_trailing_gap)
+    trailing_values = marker_data[previous_valid_frame[trailing_frames, trailing_columns], trailing_columns]
+
+    #all reads from the input are done, so it is safe if out is the input array.
+    #reshaping a non contiguous out would give a copy, so the result is built in a temporary and copied over at the end
+    result = out if out.flags.c_contiguous else np.empty(out.shape)
+    result_2d = result.reshape(num_frames, -1)
+    result_2d[...] = marker_data
+    result_2d[fill_frames, fill_columns] = fill_values
+    result_2d[trailing_frames, trailing_columns] = trailing_values
+
+    if fill_remaining_with_mean and is_leading_gap.any():
+        #replace the NaN values at the start of the recording, gaps left out by max_gap_length stay NaN
+        marker_means = np.nanmean(result, axis=(0, 2))
+        leading_mask = is_leading_gap.reshape(num_frames, num_markers, num_axes)
+        result[leading_mask] = np.broadcast_to(marker_means[None, :, None], result.shape)[leading_mask]
+
+    if result is not out:
+        out[...] = result
+
+    gap_report = build_gap_report(missing_mask.reshape(num_frames, num_markers, num_axes), ~np.isfinite(out))
+
+    return out, gap_report
 
 
 def interpolate_freemocap_data(freemocap_marker_data:np.ndarray) -> np.ndarray:
     """ Takes in a 3d skeleton numpy array from freemocap and interpolates missing NaN values"""
-    num_frames = freemocap_marker_data.shape[0]
-    num_markers = freemocap_marker_data.shape[1]
-
-    freemocap_interpolated_data = np.empty((num_frames, num_markers, 3))
-
-    for marker in track(range(num_markers), description= 'Interpolating Data'):
-        this_marker_skel3d_data = freemocap_marker_data[:,marker,:]
-        df = pd.DataFrame(this_marker_skel3d_data)
-        df2 = df.interpolate(method = 'linear',axis = 0) #use pandas interpolation methods to fill in missing data
-        this_marker_interpolated_skel3d_array = np.array(df2)
-        #replace the remaining NaN values (the ones that often happen at the start of the recording)
-        this_marker_interpolated_skel3d_array = np.where(np.isfinite(this_marker_interpolated_skel3d_array), this_marker_interpolated_skel3d_array, np.nanmean(this_marker_interpolated_skel3d_array))
-        
-        freemocap_interpolated_data[:,marker,:] = this_marker_interpolated_skel3d_array
-        
+    freemocap_interpolated_data, _ = interpolate_marker_gaps(freemocap_marker_data, method = 'linear')
     return freemocap_interpolated_data
 
 
-
-
-
 if __name__ == '__main__':
     
     from pathlib import Path
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+#chi-squared value with 2 degrees of freedom for 95% coverage, -2*ln(0.05)
+CHI_SQUARED_95_2DOF = -2*np.log(0.05)
+
+
+def get_condition_interval_arrays(condition_frame_intervals:dict):
+    """ Split a dictionary of condition name to [start frame, end frame] into a list of names and start/end frame arrays"""
+    condition_names = list(condition_frame_intervals.keys())
+    start_frames = np.array([condition_frame_intervals[condition][0] for condition in condition_names], dtype=np.intp)
+    end_frames = np.array([condition_frame_intervals[condition][1] for condition in condition_names], dtype=np.intp)
+    return condition_names, start_frames, end_frames
+
+
+def _prefix_sum(values:np.ndarray) -> np.ndarray:
+    """ Cumulative sum along the first axis with a leading zero, so the sum over [start, end) is prefix[end] - prefix[start]"""
+    return np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+
+
+def _interval_reduce(ufunc, values:np.ndarray, start_frames:np.ndarray, end_frames:np.ndarray) -> np.ndarray:
+    """ Apply ufunc.reduceat to every [start, end) interval (intervals can overlap). Empty intervals give NaN"""
+    #pad with a NaN row so an interval can end at the last frame, and interleave the starts and ends so every even entry is one interval
+    padded_values = np.concatenate([values, np.full((1,) + values.shape[1:], np.nan)])
+    interval_indices = np.column_stack([start_frames, end_frames]).reshape(-1)
+    reduced_values = ufunc.reduceat(padded_values, interval_indices, axis=0)[::2]
+    reduced_values[end_frames <= start_frames] = np.nan
+    return reduced_values
+
+
+def _power_spectrum_frequencies(positions:np.ndarray, sampling_rate:float):
+    """ Mean, median and 95% power frequency of a 1d position signal (mean removed). NaN if the signal has gaps or is too short"""
+    if positions.shape[0] < 2 or not np.all(np.isfinite(positions)):
+        return np.nan, np.nan, np.nan
+
+    power = np.abs(np.fft.rfft(positions - positions.mean()))**2
+    frequencies = np.fft.rfftfreq(positions.shape[0], d=1/sampling_rate)
+    #drop the zero frequency bin
+    power, frequencies = power[1:], frequencies[1:]
+    total_power = power.sum()
+    if total_power == 0:
+        return np.nan, np.nan, np.nan
+
+    cumulative_power = np.cumsum(power)/total_power
+    mean_frequency = np.sum(frequencies*power)/total_power
+    median_frequency = frequencies[np.searchsorted(cumulative_power, 0.5)]
+    frequency_95 = frequencies[np.searchsorted(cumulative_power, 0.95)]
+    return mean_frequency, median_frequency, frequency_95
+
+
+def calculate_sway_metrics(com_data:np.ndarray, condition_frame_intervals:dict, sampling_rate:float = 30, ml_axis:int = 0, ap_axis:int = 1) -> pd.DataFrame:
+    """ Sway metrics of a (frames, 3) center of mass trajectory for every condition in condition_frame_intervals
+    (condition name to [start frame, end frame), in frames of com_data).
+
+    The time domain metrics for all conditions come from prefix sums over the whole recording, so each one costs the same no matter how
+    many frames a condition has:
+    - path_length: total distance travelled by the COM, and normalized_path_length, that divided by the number of frames (as PathLengthCalculator reports it)
+    - mean_velocity: path length per second
+    - rms_sway_ml/rms_sway_ap/rms_sway: RMS distance from the condition's mean position along the ML and AP axes and in the horizontal plane
+    - ellipse_area_95: area of the 95% confidence ellipse of the horizontal COM position
+    - range_ml/range_ap: the extent of the COM along each horizontal axis
+    The frequency domain metrics (mean_frequency, median_frequency and frequency_95 of each horizontal axis) use an FFT per condition.
+
+    Path length, velocity and the frequency metrics are NaN if a condition has missing frames, the position metrics just leave those frames out.
+    Returns a dataframe with one row per condition"""
+    com_data = np.asarray(com_data, dtype=np.float64)
+    condition_names, start_frames, end_frames = get_condition_interval_arrays(condition_frame_intervals)
+    start_frames = np.clip(start_frames, 0, com_data.shape[0])
+    end_frames = np.clip(end_frames, start_frames, com_data.shape[0])
+    num_frames = end_frames - start_frames
+
+    #path length, from the distance between consecutive frames. The steps inside [start, end) are [start, end - 1)
+    step_distances = np.linalg.norm(np.diff(com_data, axis=0), axis=1)
+    missing_steps = ~np.isfinite(step_distances)
+    cumulative_step_distances = _prefix_sum(np.where(missing_steps, 0, step_distances))
+    cumulative_missing_steps = _prefix_sum(missing_steps.astype(np.int64))
+
+    last_step = np.maximum(end_frames - 1, start_frames)
+    path_length = cumulative_step_distances[last_step] - cumulative_step_distances[start_frames]
+    path_length[(cumulative_missing_steps[last_step] - cumulative_missing_steps[start_frames]) > 0] = np.nan
+
+    #positions are centered on the recording mean first, so the sums of squares don't lose precision
+    horizontal_positions = com_data[:, [ml_axis, ap_axis]]
+    horizontal_positions = horizontal_positions - np.nanmean(horizontal_positions, axis=0)
+    valid_frames = np.all(np.isfinite(horizontal_positions), axis=1)
+    valid_positions = np.where(valid_frames[:, np.newaxis], horizontal_positions, 0)
+
+    cumulative_positions = _prefix_sum(valid_positions)
+    cumulative_squared_positions = _prefix_sum(valid_positions**2)
+    cumulative_cross_products = _prefix_sum(valid_positions[:, 0]*valid_positions[:, 1])
+    cumulative_valid_frames = _prefix_sum(valid_frames.astype(np.int64))
+
+    num_valid_frames = cumulative_valid_frames[end_frames] - cumulative_valid_frames[start_frames]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_positions = (cumulative_positions[end_frames] - cumulative_positions[start_frames])/num_valid_frames[:, np.newaxis]
+        variances = (cumulative_squared_positions[end_frames] - cumulative_squared_positions[start_frames])/num_valid_frames[:, np.newaxis] - mean_positions**2
+        variances = np.maximum(variances, 0)
+        covariance = (cumulative_cross_products[end_frames] - cumulative_cross_products[start_frames])/num_valid_frames - mean_positions[:, 0]*mean_positions[:, 1]
+
+        covariance_determinant = np.maximum(variances[:, 0]*variances[:, 1] - covariance**2, 0)
+        ellipse_area_95 = np.pi*CHI_SQUARED_95_2DOF*np.sqrt(covariance_determinant)
+
+        normalized_path_length = path_length/num_frames
+        mean_velocity = path_length/((num_frames - 1)/sampling_rate)
+
+    ranges = _interval_reduce(np.fmax, horizontal_positions, start_frames, end_frames) - _interval_reduce(np.fmin, horizontal_positions, start_frames, end_frames)
+
+    sway_metrics = pd.DataFrame(
+        {
+            'start_frame': start_frames,
+            'end_frame': end_frames,
+            'path_length': path_length,
+            'normalized_path_length': normalized_path_length,
+            'mean_velocity': mean_velocity,
+            'rms_sway_ml': np.sqrt(variances[:, 0]),
+            'rms_sway_ap': np.sqrt(variances[:, 1]),
+            'rms_sway': np.sqrt(variances.sum(axis=1)),
+            'ellipse_area_95': ellipse_area_95,
+            'range_ml': ranges[:, 0],
+            'range_ap': ranges[:, 1],
+        },
+        index=pd.Index(condition_names, name='condition'),
+    )
+
+    for axis_count, axis_name in enumerate(['ml', 'ap']):
+        frequency_metrics = np.array([
+            _power_spectrum_frequencies(horizontal_positions[start_frame:end_frame, axis_count], sampling_rate)
+            for start_frame, end_frame in zip(start_frames, end_frames)
+        ]).reshape(-1, 3)
+        sway_metrics[f'mean_frequency_{axis_name}'] = frequency_metrics[:, 0]
+        sway_metrics[f'median_frequency_{axis_name}'] = frequency_metrics[:, 1]
+        sway_metrics[f'frequency_95_{axis_name}'] = frequency_metrics[:, 2]
+
+    return sway_metrics
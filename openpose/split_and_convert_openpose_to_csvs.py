@@ -1,9 +1,14 @@
 import numpy as np
 import pandas as pd
 from pathlib import Path
-from typing import Union
+from typing import Optional, Union
 
-def save_openpose_parts_to_csvs(data_array, output_directory):
+def save_openpose_parts_to_csvs(data_array, output_directory, columnar_format: Optional[str] = None, save_csv: bool = True):
+    """
+    Split BODY_25 + hands + face openpose data into parts and save each as `openpose_{part}.csv`.
+    If columnar_format is 'parquet' or 'arrow', each part is also saved as a float32 table with the same name
+    (readable a subset at a time with export.columnar_export.load_part_dataframe). save_csv=False skips the csvs
+    """
     # OpenPose BODY_25 body part names
     body_part_names = [
         "nose", "neck", "right_shoulder", "right_elbow", "right_wrist",
@@ -25,6 +30,10 @@ def save_openpose_parts_to_csvs(data_array, output_directory):
     right_hand_data = data_array[:, body_markers + hand_markers:body_markers + 2 * hand_markers, :]
     face_data = data_array[:, body_markers + 2 * hand_markers:total_markers, :]
 
+    if columnar_format is not None:
+        # pyarrow is only needed for the columnar export
+        from export.columnar_export import get_columnar_path, save_part_table
+
     # Prepare output directory
     output_directory = Path(output_directory)
     output_directory.mkdir(parents=True, exist_ok=True)
@@ -34,21 +43,24 @@ def save_openpose_parts_to_csvs(data_array, output_directory):
         # Flatten the data across markers and dimensions for CSV format
         flattened_data = data.reshape(data.shape[0], -1)
         
-        if part_names:
-            # If part names are provided, generate columns with detailed names
-            columns = [f"{name}_{dim}" for name in part_names for dim in ['x', 'y', 'z']]
-        else:
-            # Generate generic column names based on the number of markers, corrected to not multiply by 3
-            columns = [f"{part_name}_{i}_{dim}" for i in range(data.shape[1]) for dim in ['x', 'y', 'z']]
+        if not part_names:
+            # Generate generic marker names based on the number of markers
+            part_names = [f"{part_name}_{i}" for i in range(data.shape[1])]
+        columns = [f"{name}_{dim}" for name in part_names for dim in ['x', 'y', 'z']]
 
         assert flattened_data.shape[1] == len(columns), f"Mismatch in flattened data columns ({flattened_data.shape[1]}) and generated column names ({len(columns)})"
         
-
-        # Create a DataFrame and save to CSV
-        df = pd.DataFrame(flattened_data, columns=columns)
         csv_path = output_dir / f"openpose_{part_name}.csv"
-        df.to_csv(csv_path, index=False)
-        print(f"Saved {part_name} data to {csv_path}")
+
+        if save_csv:
+            # Create a DataFrame and save to CSV
+            df = pd.DataFrame(flattened_data, columns=columns)
+            df.to_csv(csv_path, index=False)
+            print(f"Saved {part_name} data to {csv_path}")
+
+        if columnar_format is not None:
+            table_path = save_part_table(data, part_names, part_name, get_columnar_path(csv_path, columnar_format))
+            print(f"Saved {part_name} data to {table_path}")
 
     # Save each part to CSV
     save_to_csv(body_data, "body", output_directory, body_part_names)
@@ -57,7 +69,8 @@ def save_openpose_parts_to_csvs(data_array, output_directory):
     save_to_csv(face_data, "face", output_directory)
 
 
-# Example usage
-data_array = np.load(Path(r'D:\steen_pantsOn_gait_3_cameras\output_data\openpose_postprocessed_3d_xyz.npy'))
-output_directory = Path(r"D:\steen_pantsOn_gait_3_cameras\output_data\openpose_data")
-save_openpose_parts_to_csvs(data_array, output_directory)
+if __name__ == "__main__":
+    # Example usage
+    data_array = np.load(Path(r'D:\steen_pantsOn_gait_3_cameras\output_data\openpose_postprocessed_3d_xyz.npy'))
+    output_directory = Path(r"D:\steen_pantsOn_gait_3_cameras\output_data\openpose_data")
+    save_openpose_parts_to_csvs(data_array, output_directory, columnar_format="parquet")
@@ -1,35 +1,63 @@
 from rich.progress import track
 import numpy as np
 
-def calculate_joint_centers(array_3d, joint_center_weights, marker_names):
-    num_frames, num_markers, _ = array_3d.shape
-    num_joints = len(joint_center_weights.keys())
-    
-    # Initialize an array to hold the joint centers
-    joint_centers = np.zeros((num_frames, num_joints, 3))
-
-    # Create a mapping from marker names to indices
+def build_joint_center_weight_matrix(joint_center_weights, marker_names):
+    """
+    Compile a joint center weights dictionary into arrays that can be applied to every frame at once.
+
+    Only the markers that some joint actually uses are kept, so large marker sets don't inflate the matrix.
+    Returns the indices of those markers in marker_names, a (joints, used markers, 3) weight matrix and a
+    boolean matrix of the same shape marking which joint uses which marker.
+    """
     marker_to_index = {marker: i for i, marker in enumerate(marker_names)}
-    
-    # start_time = time.time()
-
-    # Iterate over frames
-    for frame in track(range(num_frames)):
-        # if frame % 1000 == 0:
-        #     elapsed_time = time.time() - start_time
-        #     print(f"Finished frame {frame} of {num_frames}. Elapsed time: {elapsed_time:.2f} seconds")
-
-        # Iterate over joints
-        for j_idx, joint in enumerate(joint_center_weights.keys()):
-            weighted_positions = []
-            for marker, weight in joint_center_weights[joint].items():
-                marker_idx = marker_to_index[marker]
-                weighted_positions.append(array_3d[frame, marker_idx, :] * weight)
-            
-            # Sum along the 0-axis to get the joint center for this frame and joint
-            joint_centers[frame, j_idx, :] = np.sum(weighted_positions, axis=0)
-    
-    return joint_centers
 
-    f = 2
+    used_marker_names = []
+    for joint_weights in joint_center_weights.values():
+        for marker in joint_weights:
+            if marker not in used_marker_names:
+                used_marker_names.append(marker)
+
+    used_marker_indices = np.array([marker_to_index[marker] for marker in used_marker_names], dtype=np.intp)
+    used_marker_position = {marker: i for i, marker in enumerate(used_marker_names)}
+
+    weight_matrix = np.zeros((len(joint_center_weights), len(used_marker_names), 3))
+    weight_mask = np.zeros(weight_matrix.shape, dtype=bool)
+    for j_idx, joint_weights in enumerate(joint_center_weights.values()):
+        for marker, weight in joint_weights.items():
+            weight_matrix[j_idx, used_marker_position[marker], :] = weight
+            weight_mask[j_idx, used_marker_position[marker], :] = True
+
+    return used_marker_indices, weight_matrix, weight_mask
+
+def calculate_joint_centers_from_weight_matrix(array_3d, used_marker_indices, weight_matrix, weight_mask, chunk_size=None):
+    """
+    Calculate joint centers for every frame as a single weighted sum over the (frames, markers, 3) array.
+
+    A joint center is NaN on frames where any of its own markers is missing; missing markers of other joints don't affect it.
+    If chunk_size is given, frames are processed chunk_size at a time so the temporary arrays stay small on long captures.
+    """
+    num_frames = array_3d.shape[0]
+    num_joints = weight_matrix.shape[0]
+    if chunk_size is None:
+        chunk_size = max(num_frames, 1)
+
+    joint_centers = np.empty((num_frames, num_joints, 3))
+    chunk_starts = range(0, num_frames, chunk_size)
+    if len(chunk_starts) > 1:
+        chunk_starts = track(chunk_starts)
+
+    for chunk_start in chunk_starts:
+        chunk_end = min(chunk_start + chunk_size, num_frames)
+        marker_chunk = array_3d[chunk_start:chunk_end, used_marker_indices, :]
+
+        missing_markers = np.isnan(marker_chunk)
+        joint_centers[chunk_start:chunk_end] = np.einsum('fmd,jmd->fjd', np.where(missing_markers, 0, marker_chunk), weight_matrix)
+
+        missing_joints = np.einsum('fmd,jmd->fjd', missing_markers.astype(np.int32), weight_mask.astype(np.int32)) > 0
+        joint_centers[chunk_start:chunk_end][missing_joints] = np.nan
+
+    return joint_centers
 
+def calculate_joint_centers(array_3d, joint_center_weights, marker_names, chunk_size=None):
+    used_marker_indices, weight_matrix, weight_mask = build_joint_center_weight_matrix(joint_center_weights, marker_names)
+    return calculate_joint_centers_from_weight_matrix(array_3d, used_marker_indices, weight_matrix, weight_mask, chunk_size=chunk_size)
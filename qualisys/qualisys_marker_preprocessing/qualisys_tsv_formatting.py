@@ -2,26 +2,72 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 
+OUTPUT_FORMATS = ['csv', 'npy', 'parquet']
 
 
-def reformat_qualisys_tsv_data(path_to_recording_folder, tsv_name:str):
+def qualisys_dataframe_to_array(qualisys_marker_dataframe:pd.DataFrame):
+    """Turn the wide '<marker> X', '<marker> Y', '<marker> Z' columns into a (frames, markers, 3) array in one reshape.
+    The dataframe should only hold marker columns, with each marker's X column followed by its Y and Z columns.
+    Returns the array and the list of marker names"""
+    x_columns = qualisys_marker_dataframe.columns[::3]
+    marker_names = [col.split(' ')[0] for col in x_columns]
+    marker_columns = [column for x_column, marker_name in zip(x_columns, marker_names) for column in (x_column, f"{marker_name} Y", f"{marker_name} Z")]
+
+    marker_array = qualisys_marker_dataframe[marker_columns].to_numpy(dtype=np.float64).reshape(len(qualisys_marker_dataframe), len(marker_names), 3)
+    return marker_array, marker_names
+
+
+def marker_array_to_long_dataframe(marker_array:np.ndarray, marker_names:list, frame_numbers = None) -> pd.DataFrame:
+    """Turn a (frames, markers, 3) array into the long format dataframe with one (frame, marker, x, y, z) row per marker per frame"""
+    num_frames, num_markers, _ = marker_array.shape
+    if frame_numbers is None:
+        frame_numbers = np.arange(num_frames)
+
+    flat_marker_array = marker_array.reshape(num_frames * num_markers, 3)
+    return pd.DataFrame({
+        'frame': np.repeat(np.asarray(frame_numbers), num_markers),
+        'marker': np.tile(np.asarray(marker_names, dtype=object), num_frames),
+        'x': flat_marker_array[:, 0],
+        'y': flat_marker_array[:, 1],
+        'z': flat_marker_array[:, 2],
+    })
+
+
+def save_reformatted_qualisys_data(qualisys_marker_dataframe:pd.DataFrame, path_to_qualisys_folder:Path, output_format:str = 'csv'):
+    """Reshape the marker columns and save them to the qualisys folder as 'qualisys_markers_dataframe.csv' (the long format table),
+    'qualisys_markers.npy' (the (frames, markers, 3) array, with the marker names in 'qualisys_marker_names.txt') or
+    'qualisys_markers_dataframe.parquet' (the long format table, needs pyarrow). Returns the path to the saved file"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f'Output format {output_format} is not one of {OUTPUT_FORMATS}')
+
+    marker_array, marker_names = qualisys_dataframe_to_array(qualisys_marker_dataframe)
+
+    if output_format == 'npy':
+        path_to_output = path_to_qualisys_folder / 'qualisys_markers.npy'
+        np.save(path_to_output, marker_array)
+        (path_to_qualisys_folder / 'qualisys_marker_names.txt').write_text('\n'.join(marker_names))
+        return path_to_output
+
+    reorganized_qualisys_dataframe = marker_array_to_long_dataframe(marker_array, marker_names, qualisys_marker_dataframe.index.to_numpy())
+    if output_format == 'parquet':
+        path_to_output = path_to_qualisys_folder / 'qualisys_markers_dataframe.parquet'
+        reorganized_qualisys_dataframe.to_parquet(path_to_output, index=False)
+    else:
+        path_to_output = path_to_qualisys_folder / 'qualisys_markers_dataframe.csv'
+        reorganized_qualisys_dataframe.to_csv(path_to_output, index=False)
+    return path_to_output
+
+
+def reformat_qualisys_tsv_data(path_to_recording_folder, tsv_name:str, output_format:str = 'csv'):
 
     path_to_qualisys_folder = path_to_recording_folder / 'qualisys'
-    path_to_save_numpy_array = path_to_qualisys_folder / 'qualisys_markers.npy'
     path_to_tsv = path_to_qualisys_folder / tsv_name
 
     original_qualisys_dataframe =  pd.read_csv(path_to_tsv, sep='\t')
     # Drop the 'Frame' and 'Time' columns
     original_qualisys_dataframe.drop(columns=['Frame', 'Time'], inplace=True)
 
-    # Create the reorganized_data list with marker names as strings
-    reorganized_qualisys_data= [
-        [frame, col.split(' ')[0], row[col], row[f"{col.split(' ')[0]} Y"], row[f"{col.split(' ')[0]} Z"]]
-        for frame, row in original_qualisys_dataframe.iterrows() for col in original_qualisys_dataframe.columns[::3]
-    ]
-
-    reorganized_qualisys_dataframe = pd.DataFrame(reorganized_qualisys_data, columns=['frame', 'marker', 'x', 'y', 'z'])
-    reorganized_qualisys_dataframe.to_csv(path_to_qualisys_folder / 'qualisys_markers_dataframe.csv', index=False)
+    return save_reformatted_qualisys_data(original_qualisys_dataframe, path_to_qualisys_folder, output_format)
 
 if __name__ == '__main__':
     path_to_recording_folder = Path(r"D:\2023-06-07_TF01\1.0_recordings\treadmill_calib\sesh_2023-06-07_12_06_15_JH_flexion_neutral_trial_1")
@@ -2,40 +2,33 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 
+from qualisys.qualisys_marker_preprocessing.qualisys_tsv_formatting import (
+    qualisys_dataframe_to_array,
+    marker_array_to_long_dataframe,
+    save_reformatted_qualisys_data,
+)
 
 
-def reformat_synced_qualisys_tsv_data_from_folder(path_to_recording_folder, tsv_name:str):
+def drop_non_marker_columns(synced_qualisys_marker_dataframe:pd.DataFrame) -> pd.DataFrame:
+    return synced_qualisys_marker_dataframe.drop(columns=['Frame', 'Time', 'unix_timestamps'] + [col for col in synced_qualisys_marker_dataframe.columns if 'Unnamed' in col])
+
+
+def reformat_synced_qualisys_tsv_data_from_folder(path_to_recording_folder, tsv_name:str, output_format:str = 'csv'):
 
     path_to_qualisys_folder = path_to_recording_folder / 'qualisys_data'
-    # path_to_save_numpy_array = path_to_qualisys_folder / 'qualisys_markers.npy'
     path_to_tsv = path_to_qualisys_folder / tsv_name
 
     original_qualisys_dataframe =  pd.read_csv(path_to_tsv, sep='\t')
-    # Drop the 'Frame' and 'Time' columns
-    original_qualisys_dataframe.drop(columns=['Frame', 'Time', 'unix_timestamps'] + [col for col in original_qualisys_dataframe.columns if 'Unnamed' in col], inplace=True)
-
-
-    # Create the reorganized_data list with marker names as strings
-    reorganized_qualisys_data= [
-        [frame, col.split(' ')[0], row[col], row[f"{col.split(' ')[0]} Y"], row[f"{col.split(' ')[0]} Z"]]
-        for frame, row in original_qualisys_dataframe.iterrows() for col in original_qualisys_dataframe.columns[::3]
-    ]
-
-    reorganized_qualisys_dataframe = pd.DataFrame(reorganized_qualisys_data, columns=['frame', 'marker', 'x', 'y', 'z'])
-    reorganized_qualisys_dataframe.to_csv(path_to_qualisys_folder / 'qualisys_markers_dataframe.csv', index=False)
-
+    # Drop the 'Frame', 'Time' and timestamp columns
+    qualisys_marker_dataframe = drop_non_marker_columns(original_qualisys_dataframe)
 
-def reformat_synced_qualisys_data_as_csv(pasynced_qualisys_marker_dataframe):
-    synced_qualisys_marker_dataframe.drop(columns=['Frame', 'Time', 'unix_timestamps'] + [col for col in synced_qualisys_marker_dataframe.columns if 'Unnamed' in col], inplace=True)
-    # Create the reorganized_data list with marker names as strings
-    reorganized_qualisys_data= [
-        [frame, col.split(' ')[0], row[col], row[f"{col.split(' ')[0]} Y"], row[f"{col.split(' ')[0]} Z"]]
-        for frame, row in synced_qualisys_marker_dataframe.iterrows() for col in synced_qualisys_marker_dataframe.columns[::3]
-    ]
+    return save_reformatted_qualisys_data(qualisys_marker_dataframe, path_to_qualisys_folder, output_format)
 
-    reorganized_qualisys_dataframe = pd.DataFrame(reorganized_qualisys_data, columns=['frame', 'marker', 'x', 'y', 'z'])
-    return reorganized_qualisys_dataframe
 
+def reformat_synced_qualisys_data_as_csv(synced_qualisys_marker_dataframe):
+    qualisys_marker_dataframe = drop_non_marker_columns(synced_qualisys_marker_dataframe)
+    marker_array, marker_names = qualisys_dataframe_to_array(qualisys_marker_dataframe)
+    return marker_array_to_long_dataframe(marker_array, marker_names, qualisys_marker_dataframe.index.to_numpy())
 
 
 if __name__ == '__main__':
@@ -43,7 +36,7 @@ if __name__ == '__main__':
     # tsv_name = 'flexion_neutral_trial_1_tracked_with_header_synchronized.tsv'
     path_to_recording_folder = Path(r'D:\2023-06-07_TF01\1.0_recordings\treadmill_calib\sesh_2023-06-07_12_38_16_TF01_leg_length_neg_5_trial_1')
     tsv_name = 'synchronized_markers.tsv'
-    reformat_synced_qualisys_tsv_data(path_to_recording_folder, tsv_name)
+    reformat_synced_qualisys_tsv_data_from_folder(path_to_recording_folder, tsv_name)
 
 
 
@@ -3,7 +3,8 @@ from pathlib import Path
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from typing import Tuple
+from scipy import signal
+from typing import List, Tuple
 
 from qualisys.qualisys_marker_preprocessing.synced_qualisys_tsv_reformatting import reformat_synced_qualisys_tsv_data_from_folder
 
@@ -45,18 +46,95 @@ def insert_qualisys_timestamp_column(df, start_timestamp, lag_in_seconds=0):
     
     return df
 
+def calculate_binned_means(sample_values: np.ndarray, sample_timestamps: np.ndarray, bin_timestamps: np.ndarray) -> np.ndarray:
+    """
+    Average the samples that fall between each pair of consecutive bin timestamps, for all columns at once.
+
+    Bin i holds the samples with bin_timestamps[i] <= timestamp < bin_timestamps[i + 1]. The last bin has no end, so like the
+    original frame by frame version it takes the first sample at or after the last bin timestamp instead of a mean.
+    NaNs are skipped when averaging, and bins with no valid samples are NaN.
+
+    Parameters:
+        sample_values (np.ndarray): (samples, columns) array of values to average, e.g. Qualisys marker columns.
+        sample_timestamps (np.ndarray): (samples,) increasing timestamps of the samples.
+        bin_timestamps (np.ndarray): (bins,) timestamps marking the start of each bin, e.g. FreeMoCap frame timestamps.
+
+    Returns:
+        np.ndarray: (bins, columns) array of the averaged values.
+    """
+    sample_values = np.asarray(sample_values, dtype=np.float64)
+    sample_timestamps = np.asarray(sample_timestamps, dtype=np.float64)
+    bin_timestamps = np.asarray(bin_timestamps, dtype=np.float64)
+    num_samples = sample_values.shape[0]
+    num_bins = bin_timestamps.shape[0]
+
+    bin_starts = np.searchsorted(sample_timestamps, bin_timestamps, side='left')
+    bin_ends = np.append(bin_starts[1:], num_samples)
+    bin_is_empty = (bin_ends <= bin_starts) | np.isnan(bin_timestamps) | np.isnan(np.append(bin_timestamps[1:], np.inf))
+
+    # pad with a zero row so every start/end is a valid index for reduceat. For each interleaved (start, end) pair, reduceat
+    # sums start:end, which is the bin. Empty bins give garbage that gets masked out below
+    valid_mask = np.isfinite(sample_values)
+    padded_values = np.vstack([np.where(valid_mask, sample_values, 0), np.zeros((1, sample_values.shape[1]))])
+    padded_counts = np.vstack([valid_mask, np.zeros((1, sample_values.shape[1]), dtype=bool)]).astype(np.int64)
+    reduce_indices = np.column_stack([np.minimum(bin_starts, num_samples), bin_ends]).ravel()
+
+    bin_sums = np.add.reduceat(padded_values, reduce_indices, axis=0)[::2]
+    bin_counts = np.add.reduceat(padded_counts, reduce_indices, axis=0)[::2]
+    bin_counts[bin_is_empty] = 0
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        binned_means = np.where(bin_counts > 0, bin_sums / bin_counts, np.nan)
+
+    if num_bins > 0:
+        last_bin_start = bin_starts[-1]
+        binned_means[-1] = sample_values[last_bin_start] if last_bin_start < num_samples and not np.isnan(bin_timestamps[-1]) else np.nan
+
+    return binned_means
+
+
+def get_qualisys_marker_names(qualisys_df: pd.DataFrame) -> List[str]:
+    """
+    Get the marker names from the '<marker> X' columns of a Qualisys dataframe, in column order.
+    """
+    return [column[:-len(' X')] for column in qualisys_df.columns if column.endswith(' X')]
+
+
+def synchronize_qualisys_data_to_array(qualisys_df: pd.DataFrame, freemocap_timestamps, marker_names: List[str] = None) -> np.ndarray:
+    """
+    Resample Qualisys marker data onto the FreeMoCap frame timestamps by averaging all the Qualisys samples that fall in each FreeMoCap frame.
+
+    Parameters:
+        qualisys_df (pd.DataFrame): The Qualisys dataframe with a 'unix_timestamps' column and '<marker> X/Y/Z' columns.
+        freemocap_timestamps: The FreeMoCap unix timestamp for each frame.
+        marker_names (List[str], optional): The markers to include, in order. Defaults to every marker in the dataframe.
+
+    Returns:
+        np.ndarray: A (frames, markers, 3) array of the synchronized Qualisys marker data.
+    """
+    if marker_names is None:
+        marker_names = get_qualisys_marker_names(qualisys_df)
+
+    marker_columns = [f'{marker_name} {axis}' for marker_name in marker_names for axis in ('X', 'Y', 'Z')]
+    binned_marker_data = calculate_binned_means(
+        qualisys_df[marker_columns].to_numpy(dtype=np.float64),
+        qualisys_df['unix_timestamps'].to_numpy(dtype=np.float64),
+        np.asarray(freemocap_timestamps, dtype=np.float64),
+    )
+    return binned_marker_data.reshape(-1, len(marker_names), 3)
+
+
 def synchronize_qualisys_data(qualisys_df, freemocap_timestamps):
-    synchronized_rows = {}
-    for frame_number, timestamp in enumerate(freemocap_timestamps):
-        if frame_number + 1 < len(freemocap_timestamps):
-            next_timestamp = freemocap_timestamps[frame_number + 1]
-            rows_in_range = qualisys_df.loc[(qualisys_df['unix_timestamps'] >= timestamp) & (qualisys_df['unix_timestamps'] < next_timestamp)]
-            mean_row = rows_in_range.mean(axis=0, skipna=True)
-        else:
-            rows_in_range = qualisys_df.loc[(qualisys_df['unix_timestamps'] >= timestamp)]
-            mean_row = rows_in_range.iloc[0]
-        synchronized_rows[frame_number] = mean_row
-    return pd.DataFrame.from_dict(synchronized_rows, orient='index', columns=qualisys_df.columns)
+    """
+    Resample every column of the Qualisys dataframe onto the FreeMoCap frame timestamps, returning a dataframe with one row per FreeMoCap frame.
+    Use synchronize_qualisys_data_to_array to get the marker data as a (frames, markers, 3) array instead.
+    """
+    synchronized_values = calculate_binned_means(
+        qualisys_df.to_numpy(dtype=np.float64),
+        qualisys_df['unix_timestamps'].to_numpy(dtype=np.float64),
+        np.asarray(freemocap_timestamps, dtype=np.float64),
+    )
+    return pd.DataFrame(synchronized_values, columns=qualisys_df.columns)
 
 
 def normalize(signal: pd.Series) -> pd.Series:
@@ -72,16 +150,85 @@ def normalize(signal: pd.Series) -> pd.Series:
     return (signal - signal.mean()) / signal.std()
 
 
-def calculate_optimal_lag(freemocap_data: pd.Series, qualisys_data: pd.Series) -> int:
+def normalize_signals(signals: np.ndarray) -> np.ndarray:
+    """
+    Normalize each column of a (frames, signals) array to zero mean and unit variance, ignoring NaNs.
+    NaNs are then set to zero so they don't contribute to the cross-correlation.
+    """
+    signals = np.asarray(signals, dtype=np.float64)
+    normalized_signals = (signals - np.nanmean(signals, axis=0)) / np.nanstd(signals, axis=0, ddof=1)
+    return np.nan_to_num(normalized_signals, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def interpolate_peak(cross_corr: np.ndarray, peak_index: int) -> float:
+    """
+    Fit a parabola through the cross-correlation peak and its two neighbours and return the sub-sample offset of the parabola's vertex from the peak index.
+    """
+    if peak_index == 0 or peak_index == len(cross_corr) - 1:
+        return 0.0
+    left, center, right = cross_corr[peak_index - 1], cross_corr[peak_index], cross_corr[peak_index + 1]
+    denominator = left - 2 * center + right
+    if denominator == 0:
+        return 0.0
+    return 0.5 * (left - right) / denominator
+
+
+def calculate_combined_optimal_lag(freemocap_data, qualisys_data) -> dict:
+    """
+    Estimate a single sub-frame lag between FreeMoCap and Qualisys data from several markers and axes at once.
+
+    Each pair of columns is normalized and cross-correlated with an FFT, the correlations are averaged, and the lag is taken from the
+    peak of the average with parabolic interpolation. The averaged correlation at the peak is roughly the Pearson correlation between
+    the shifted signals, and is returned as the confidence score.
+
+    Parameters:
+        freemocap_data: (frames, signals) array or dataframe of FreeMoCap data, e.g. several marker axes.
+        qualisys_data: (frames, signals) array or dataframe of Qualisys data, with columns in the same order as freemocap_data.
+
+    Returns:
+        dict: 'lag' (float, in frames), 'confidence' (the averaged correlation at the peak), 'per_signal_lags' (the integer lag for each column on its own)
+              and 'cross_correlation' (the averaged correlation for every lag).
+    """
+    freemocap_signals = np.asarray(freemocap_data, dtype=np.float64)
+    qualisys_signals = np.asarray(qualisys_data, dtype=np.float64)
+    if freemocap_signals.ndim == 1:
+        freemocap_signals = freemocap_signals[:, np.newaxis]
+    if qualisys_signals.ndim == 1:
+        qualisys_signals = qualisys_signals[:, np.newaxis]
+    if freemocap_signals.shape[1] != qualisys_signals.shape[1]:
+        raise ValueError(f"FreeMoCap data has {freemocap_signals.shape[1]} signals but Qualisys data has {qualisys_signals.shape[1]}")
+
+    # Ensure the two signals are of the same length (trimming the longer one if necessary)
+    min_length = min(freemocap_signals.shape[0], qualisys_signals.shape[0])
+    normalized_freemocap = normalize_signals(freemocap_signals[:min_length])
+    normalized_qualisys = normalize_signals(qualisys_signals[:min_length])
+
+    # Cross-correlate every column pair at once (correlation is convolution with the second signal reversed)
+    cross_corr = signal.fftconvolve(normalized_freemocap, normalized_qualisys[::-1], mode='full', axes=0) / min_length
+    combined_cross_corr = cross_corr.mean(axis=1)
+
+    peak_index = int(np.argmax(combined_cross_corr))
+    lag = peak_index - (min_length - 1) + interpolate_peak(combined_cross_corr, peak_index)
+
+    return {
+        'lag': lag,
+        'confidence': combined_cross_corr[peak_index],
+        'per_signal_lags': np.argmax(cross_corr, axis=0) - (min_length - 1),
+        'cross_correlation': combined_cross_corr,
+    }
+
+
+def calculate_optimal_lag(freemocap_data: pd.Series, qualisys_data: pd.Series, sub_frame: bool = False):
     """
-    Calculate the optimal lag between FreeMoCap and Qualisys data using cross-correlation.
+    Calculate the optimal lag between FreeMoCap and Qualisys data using FFT cross-correlation.
 
     Parameters:
         freemocap_data (pd.Series): The FreeMoCap data series to compare.
         qualisys_data (pd.Series): The Qualisys data series to compare.
+        sub_frame (bool, optional): Return a float lag refined with parabolic peak interpolation instead of a whole number of frames. Default is False.
 
     Returns:
-        int: The optimal lag between the two data series.
+        int: The optimal lag between the two data series (a float if sub_frame is True).
     """
     # Ensure the two signals are of the same length (trimming the longer one if necessary)
     min_length = min(len(freemocap_data), len(qualisys_data))
@@ -93,10 +240,13 @@ def calculate_optimal_lag(freemocap_data: pd.Series, qualisys_data: pd.Series) -
     normalized_qualisys = normalize(qualisys_data)
 
     # Compute the cross-correlation
-    cross_corr = np.correlate(normalized_freemocap, normalized_qualisys, mode='full')
+    cross_corr = signal.correlate(normalized_freemocap, normalized_qualisys, mode='full', method='fft')
 
     # Find the lag that maximizes the cross-correlation
-    optimal_lag = np.argmax(cross_corr) - (len(normalized_freemocap) - 1)
+    peak_index = np.argmax(cross_corr)
+    optimal_lag = peak_index - (len(normalized_freemocap) - 1)
+    if sub_frame:
+        optimal_lag = optimal_lag + interpolate_peak(cross_corr, peak_index)
     print(f"The optimal lag is: {optimal_lag}")
 
     return optimal_lag
@@ -225,6 +375,6 @@ synchronized_qualisys_df.to_csv(recording_folder_path/'qualisys_data'/synced_tsv
 # synchronized_qualisys_df.to_csv(Path(r"D:\2023-06-07_TF01\1.0_recordings\treadmill_calib\sesh_2023-06-07_12_06_15_TF01_flexion_neutral_trial_1\qualisys\flexion_neutral_trial_1_tracked_with_header_synchronized.tsv"),
 #                                 sep="\t", index=False)
 
-reformat_synced_qualisys_tsv_data_from_folder(recording_folder_path, synchronized_qualisys_df)
+reformat_synced_qualisys_tsv_data_from_folder(recording_folder_path, synced_tsv_name)
 print('Saved synced TSV and reformatted CSV')
 f = 2   
\ No newline at end of file
@@ -8,6 +8,7 @@ from freemocap_utils.mediapipe_skeleton_builder import mediapipe_indices
 from scipy import signal
 import scipy
 from freemocap_utils.skeleton_interpolation import interpolate_freemocap_data
+from freemocap_utils.skeleton_filtering import filter_skeleton_data
 
 qualisys_indices = [
 'head',
@@ -34,28 +35,6 @@ qualisys_indices = [
 'right_foot_index',
 ]
 
-def butter_lowpass_filter(data, cutoff, sampling_rate, order):
-    """ Run a low pass butterworth filter on a single column of data"""
-    nyquist_freq = 0.5*sampling_rate
-    normal_cutoff = cutoff / nyquist_freq
-    # Get the filter coefficients 
-    b, a = signal.butter(order, normal_cutoff, btype='low', analog=False)
-    y = signal.filtfilt(b, a, data)
-    return y
-
-
-def filter_skeleton(skeleton_3d_data, cutoff, sampling_rate, order):
-    """ Take in a 3d skeleton numpy array and run a low pass butterworth filter on each marker in the data"""
-    num_frames = skeleton_3d_data.shape[0]
-    num_markers = skeleton_3d_data.shape[1]
-    filtered_data = np.empty((num_frames,num_markers,3))
-
-    for marker in range(num_markers):
-        for x in range(3):
-            filtered_data[:,marker,x] = butter_lowpass_filter(skeleton_3d_data[:,marker,x],cutoff,sampling_rate,order)
-    
-    return filtered_data
-
 
 #path_to_qualisys_session_folder = Path(r"D:\ValidationStudy2022\FreeMocap_Data\qualisys_sesh_2022-05-24_16_02_53_JSM_T1_NIH")
 path_to_qualisys_session_folder = Path(r"D:\ValidationStudy2022\FreeMocap_Data\qualisys_sesh_2022-05-24_16_02_53_JSM_T1_BOS")
@@ -70,7 +49,7 @@ q = 10
 t_old = np.linspace(0,num_samples*(1/300),num_samples)
 t_new = np.linspace(0,num_samples*(1/300),int(num_samples/q))
 
-filtered_qualisys_skeleton = filter_skeleton(interpolated_qualisys_data,6,300,4)
+filtered_qualisys_skeleton = filter_skeleton_data(interpolated_qualisys_data,6,300,4)
 
 downsampled_qualisys_data = np.empty([int(num_samples/q),num_markers,num_dimensions])
 
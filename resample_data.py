@@ -8,31 +8,9 @@ import numpy as np
 from scipy import signal
 import scipy
 from freemocap_utils.skeleton_interpolation import interpolate_freemocap_data
+from freemocap_utils.skeleton_filtering import filter_skeleton_data
 
 
-def butter_lowpass_filter(data, cutoff, sampling_rate, order):
-    """ Run a low pass butterworth filter on a single column of data"""
-    nyquist_freq = 0.5*sampling_rate
-    normal_cutoff = cutoff / nyquist_freq
-    # Get the filter coefficients 
-    b, a = signal.butter(order, normal_cutoff, btype='low', analog=False)
-    y = signal.filtfilt(b, a, data)
-    return y
-
-
-def butterworth_filter_data(data_to_filter, cutoff, sampling_rate, order):
-    """ Take in a 3d skeleton numpy array and run a low pass butterworth filter on each marker in the data"""
-    num_frames = data_to_filter.shape[0]
-    num_markers = data_to_filter.shape[1]
-    filtered_data = np.empty((num_frames,num_markers,3))
-
-    for marker in range(num_markers):
-        for x in range(3):
-            filtered_data[:,marker,x] = butter_lowpass_filter(data_to_filter[:,marker,x],cutoff,sampling_rate,order)
-    
-    return filtered_data
-    
-
 def resample_data(data_to_resample:np.ndarray, original_framerate:float, framerate_to_resample_to:float):
     num_samples = data_to_resample.shape[0]
     num_markers = data_to_resample.shape[1]
@@ -61,7 +39,7 @@ freemocap_data = np.load(path_to_freemocap_session_folder/'output_data'/'mediaPi
 path_to_qualisys_session_folder = path_to_freemocap_session_folder
 qualisys_data = np.load(path_to_qualisys_session_folder/'qualisys_data'/'qualisys_joint_centers_3d_xyz.npy')
 interpolated_qualisys_data = interpolate_freemocap_data(qualisys_data)
-filtered_qualisys_data = butterworth_filter_data(interpolated_qualisys_data,cutoff=6, sampling_rate=29.954299049366554, order=4)
+filtered_qualisys_data = filter_skeleton_data(interpolated_qualisys_data,cutoff=6, sampling_rate=29.954299049366554, order=4)
 
 freemocap_framerate = 29.954282127686497
 qualisys_framerate = 29.954299049366554
@@ -11,6 +11,7 @@ from freemocap_utils.GUI_widgets.time_syncing_widgets.marker_selector_widget imp
 from freemocap_utils.GUI_widgets.rmse_widgets.frame_selector_widget import FrameSelectorWidget
 from freemocap_utils.GUI_widgets.rmse_widgets.RMSE_calculator import calculate_rmse_dataframe
 from freemocap_utils.GUI_widgets.rmse_widgets.reference_frame_widget import ReferenceFrameWidget
+from freemocap_utils.GUI_widgets.rmse_widgets.sliding_window_rmse_widget import SlidingWindowRMSEWidget
 
 
 from freemocap_utils.GUI_widgets.rmse_widgets.plot_3d_widget import Scatter3DWidget
@@ -24,6 +25,7 @@ from PyQt6.QtWidgets import QMainWindow, QWidget, QApplication, QHBoxLayout,QVBo
 
 from freemocap_utils.mediapipe_skeleton_builder import mediapipe_indices
 from freemocap_utils.qualisys_indices import qualisys_indices
+from freemocap_utils.rmse_calculation import get_marker_correspondence, rmse_array_to_dataframe, RMSEPrefixSums
 
 
 class RMSEViewerGUI(QMainWindow):
@@ -36,8 +38,14 @@ class RMSEViewerGUI(QMainWindow):
         self.freemocap_data_original = freemocap_data_original
         self.qualisys_data_original = qualisys_data_original
 
-        self.freemocap_data = freemocap_data_original.copy()
-        self.qualisys_data = qualisys_data_original.copy()
+        self.freemocap_data = freemocap_data_original
+        self.qualisys_data = qualisys_data_original
+
+        #cumulative squared errors are computed once here, so every frame range/reference frame RMSE after this is a lookup
+        self.marker_correspondence = get_marker_correspondence(mediapipe_indices, qualisys_indices)
+        self.rmse_prefix_sums = RMSEPrefixSums(qualisys_data_original, freemocap_data_original, self.marker_correspondence)
+        self.frame_interval = [0, freemocap_data_original.shape[0]]
+        self.reference_frame = None
 
         self.marker_selector_widget = MarkerSelectorWidget()
         layout.addWidget(self.marker_selector_widget)
@@ -54,6 +62,9 @@ class RMSEViewerGUI(QMainWindow):
         self.plot_3d = Scatter3DWidget(freemocap_data=self.freemocap_data, qualisys_data=self.qualisys_data)
         plots_layout.addWidget(self.plot_3d)
 
+        self.sliding_window_rmse_widget = SlidingWindowRMSEWidget(self.rmse_prefix_sums)
+        plots_layout.addWidget(self.sliding_window_rmse_widget)
+
         self.reference_frame_widget = ReferenceFrameWidget()
         layout.addWidget(self.reference_frame_widget)
 
@@ -76,15 +87,24 @@ class RMSEViewerGUI(QMainWindow):
 
     def run_initial_plots(self):
         # self.zero_data()
+        self.freemocap_data = self.freemocap_data_original
+        self.qualisys_data = self.qualisys_data_original
+        self.frame_interval = [0, self.freemocap_data_original.shape[0]]
+        self.reference_frame = None
         self.time_series_viewer_widget.update_plot(self.marker_selector_widget.current_marker,freemocap_data=self.freemocap_data_original, qualisys_data=self.qualisys_data_original            )
-        self.rmse_viewer_widget.update_plot(qualisys_data=self.qualisys_data, freemocap_data=self.freemocap_data)
+        self.update_rmse_plot()
+        self.sliding_window_rmse_widget.set_reference_frame(self.reference_frame)
+
+    def update_rmse_plot(self):
+        rmse_array = self.rmse_prefix_sums.calculate_rmse(*self.frame_interval, reference_frame=self.reference_frame)
+        self.rmse_viewer_widget.plot_rmse_dataframe(rmse_array_to_dataframe(rmse_array, self.marker_correspondence.marker_names))
         
         
 
     def handle_plotting(self):
         # self.zero_data()
         self.time_series_viewer_widget.update_plot(self.marker_selector_widget.current_marker,freemocap_data=self.freemocap_data, qualisys_data=self.qualisys_data)
-        self.rmse_viewer_widget.update_plot(qualisys_data=self.qualisys_data, freemocap_data=self.freemocap_data)
+        self.update_rmse_plot()
         self.plot_3d.update_data(freemocap_data=self.freemocap_data, qualisys_data=self.qualisys_data)
         def calculate_rmse_per_timepoint_per_dimension(qualisys_data, freemocap_data, qualisys_indices, mediapipe_indices):
             num_timepoints, _, _ = qualisys_data.shape
@@ -126,6 +146,9 @@ class RMSEViewerGUI(QMainWindow):
     def handle_updated_frames(self):
         self.qualisys_data = self.frame_selector_widget.get_sliced_qualisys_data()
         self.freemocap_data = self.frame_selector_widget.get_sliced_freemocap_data()
+        #the sliced data isn't zeroed, so neither is the RMSE
+        self.frame_interval = self.frame_selector_widget.get_frame_interval()
+        self.reference_frame = None
         self.handle_plotting()
 
         # Calculate RMSE dataframe for the specified frames
@@ -133,7 +156,10 @@ class RMSEViewerGUI(QMainWindow):
     def zero_data(self, reference_frame):
         self.freemocap_data = self.freemocap_data_original[:,:,:] - self.freemocap_data_original[reference_frame,:,:]
         self.qualisys_data = self.qualisys_data_original[:,:,:] - self.qualisys_data_original[reference_frame,:,:]
+        self.frame_interval = [0, self.freemocap_data_original.shape[0]]
+        self.reference_frame = reference_frame
         self.handle_plotting()
+        self.sliding_window_rmse_widget.set_reference_frame(reference_frame)
     
         # difference = abs(np.nanmean(self.freemocap_data[:,:,:]) - np.nanmean(self.qualisys_data[:,:,:]))
         # self.freemocap_data = self.freemocap_data[:,:,:] -difference
@@ -1,50 +1,11 @@
 from pathlib import Path
 import numpy as np
 from freemocap_utils.mediapipe_skeleton_builder import mediapipe_indices
+from shoe_lift_analysis.gait_events import detect_gait_events
 from scipy.interpolate import interp1d
 import matplotlib.pyplot as plt
 
 
-def load_specific_marker_data(marker_data:np.ndarray, joint_to_use:str, axis_to_use:int):
-    #for axis to use, 0 = x axis, 1 = y axis, 2 = z axis
-    joint_index = mediapipe_indices.index(joint_to_use)
-    marker_position_3d = marker_data[:, joint_index, :]
-    marker_position_1d = marker_position_3d[:,axis_to_use]
-    marker_velocity_1d = np.diff(marker_position_1d, axis = 0)
-    marker_velocity_1d = np.append(0,marker_velocity_1d)
-
-    return marker_position_1d, marker_velocity_1d
-
-def detect_zero_crossings(marker_velocity_data:np.ndarray, search_range=2, show_plot = False):
-    threshold_to_ignore_next_crossing = 5
-    zero_crossings = np.where(np.diff(np.sign(marker_velocity_data)))[0]
-
-    thresholded_zero_crossings_frames = list(zero_crossings.copy())
-
-    for count,frame in enumerate(thresholded_zero_crossings_frames):
-        frames_to_filter_out = np.array(range(frame+1,frame+threshold_to_ignore_next_crossing))
-        thresholded_zero_crossings_frames = np.setdiff1d(thresholded_zero_crossings_frames,frames_to_filter_out)
-
-    zero_crossings = thresholded_zero_crossings_frames
-
-    heel_strike_frames = []
-    toe_off_frames = []
-
-    #searches around the located zero crossing frames to find the frame that has the lowest velocity within the search range
-    for frame in zero_crossings:
-        start = max(0, frame - search_range)
-        end = min(len(marker_velocity_data) - 1, frame + search_range)
-        min_abs_velocity_index = start + np.argmin(np.abs(marker_velocity_data[start:end+1]))
-
-        #if the velocity is negative at the original detected frame (which is right before the 0 crossing), then it's toe off (slope is positive)
-        if marker_velocity_data[frame] > 0:
-            heel_strike_frames.append(min_abs_velocity_index)
-        else:
-            toe_off_frames.append(min_abs_velocity_index)
-
-    return heel_strike_frames, toe_off_frames
-
-
 def divide_com_data_into_steps(marker_position_3d_data: np.ndarray, event_frames: list):
     num_frames,num_dimensions = marker_position_3d_data.shape
         
@@ -314,8 +275,8 @@ if __name__ == '__main__':
         marker_data_3d[:,1000:2000,0] = marker_data_3d[:,1000:2000,0]*-1
 
         
-        marker_position, marker_velocity = load_specific_marker_data(marker_data=marker_data_3d, joint_to_use='left_heel', axis_to_use = 0)
-        heel_strike_frames, toe_off_frames = detect_zero_crossings(marker_velocity_data=marker_velocity,search_range=2)
+        gait_events = detect_gait_events(marker_data=marker_data_3d, markers_to_use=['left_heel'], axis_to_use=0, search_range=2)
+        heel_strike_frames, toe_off_frames = gait_events['left_heel']['heel strike'], gait_events['left_heel']['toe off']
 
         step_data_3d = divide_3d_data_into_steps(marker_data_3d,heel_strike_frames)
         resampled_step_data_3d = resample_steps(step_data_dict=step_data_3d, num_resampled_points=100)
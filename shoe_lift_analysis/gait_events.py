@@ -0,0 +1,73 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from freemocap_utils.mediapipe_skeleton_builder import mediapipe_indices
+
+THRESHOLD_TO_IGNORE_NEXT_CROSSING = 5
+
+
+def calculate_marker_velocities(marker_data:np.ndarray, marker_indices:list, axis_to_use:int):
+    #frame to frame velocity along one axis for each marker, with a 0 on the first frame so velocity frames line up with position frames
+    marker_positions = marker_data[:, marker_indices, axis_to_use]
+    return np.vstack([np.zeros_like(marker_positions[:1]), np.diff(marker_positions, axis = 0)])
+
+
+def find_zero_crossing_events(marker_velocity_data:np.ndarray, search_range = 2, threshold_to_ignore_next_crossing = THRESHOLD_TO_IGNORE_NEXT_CROSSING):
+    """
+    Finds the velocity zero crossings in every column of a (frames, markers) velocity array at once.
+    A crossing is ignored if it comes less than threshold_to_ignore_next_crossing frames after the previous crossing of the same marker.
+    Each crossing is moved to the frame with the lowest absolute velocity within search_range frames of it, and is a heel strike if the velocity
+    is positive right before the crossing (a toe off otherwise).
+    Returns the event frames, the column each event belongs to and whether it is a heel strike, sorted by column then frame
+    """
+    num_frames = marker_velocity_data.shape[0]
+
+    #transposed so the crossings come out grouped by marker, in frame order
+    marker_columns, zero_crossings = np.nonzero(np.diff(np.sign(marker_velocity_data), axis = 0).T)
+
+    #a crossing is kept if the previous crossing of the same marker is at least threshold_to_ignore_next_crossing frames before it
+    frames_since_last_crossing = np.diff(zero_crossings, prepend = -threshold_to_ignore_next_crossing)
+    new_marker = np.diff(marker_columns, prepend = -1) != 0
+    crossings_to_keep = new_marker | (frames_since_last_crossing >= threshold_to_ignore_next_crossing)
+    marker_columns = marker_columns[crossings_to_keep]
+    zero_crossings = zero_crossings[crossings_to_keep]
+
+    #searches around the located zero crossing frames to find the frame that has the lowest velocity within the search range,
+    #with every search window read from one strided view of the (padded) absolute velocities
+    padded_abs_velocity = np.pad(np.abs(marker_velocity_data).astype(float), ((search_range, search_range), (0, 0)), constant_values = np.inf)
+    search_windows = sliding_window_view(padded_abs_velocity, 2*search_range + 1, axis = 0)[:num_frames]
+    event_frames = zero_crossings - search_range + np.argmin(search_windows[zero_crossings, marker_columns], axis = 1)
+
+    #if the velocity is negative at the original detected frame (which is right before the 0 crossing), then it's toe off (slope is positive)
+    is_heel_strike = marker_velocity_data[zero_crossings, marker_columns] > 0
+
+    return event_frames, marker_columns, is_heel_strike
+
+
+def detect_zero_crossings(marker_velocity_data:np.ndarray, search_range = 2, threshold_to_ignore_next_crossing = THRESHOLD_TO_IGNORE_NEXT_CROSSING):
+    #heel strike and toe off frames from the velocity of a single marker
+    event_frames, _, is_heel_strike = find_zero_crossing_events(np.asarray(marker_velocity_data)[:, np.newaxis], search_range, threshold_to_ignore_next_crossing)
+    return event_frames[is_heel_strike], event_frames[~is_heel_strike]
+
+
+def detect_gait_events(marker_data:np.ndarray, markers_to_use = ('left_heel', 'right_heel'), axis_to_use = 0, search_range = 2,
+                       threshold_to_ignore_next_crossing = THRESHOLD_TO_IGNORE_NEXT_CROSSING, marker_names = mediapipe_indices):
+    """
+    Heel strikes and toe offs of each marker in markers_to_use (both heels by default) in one pass over the (frames, markers, 3) marker data,
+    from the zero crossings of their velocity along axis_to_use (0 = x axis, 1 = y axis, 2 = z axis).
+    Returns {marker: {'heel strike': frames, 'toe off': frames, 'position': position, 'velocity': velocity}}, with the position and velocity along axis_to_use
+    """
+    marker_indices = [marker_names.index(marker) for marker in markers_to_use]
+    marker_velocities = calculate_marker_velocities(marker_data, marker_indices, axis_to_use)
+    event_frames, marker_columns, is_heel_strike = find_zero_crossing_events(marker_velocities, search_range, threshold_to_ignore_next_crossing)
+
+    gait_events = {}
+    for marker_column, marker in enumerate(markers_to_use):
+        marker_events = marker_columns == marker_column
+        gait_events[marker] = {
+            'heel strike': event_frames[marker_events & is_heel_strike],
+            'toe off': event_frames[marker_events & ~is_heel_strike],
+            'position': marker_data[:, marker_indices[marker_column], axis_to_use],
+            'velocity': marker_velocities[:, marker_column],
+        }
+
+    return gait_events
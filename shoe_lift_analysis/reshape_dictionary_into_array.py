@@ -1,6 +1,7 @@
 from pathlib import Path
 import numpy as np
 from freemocap_utils.mediapipe_skeleton_builder import mediapipe_indices
+from shoe_lift_analysis.gait_events import detect_zero_crossings
 from scipy.interpolate import interp1d
 import matplotlib.pyplot as plt
 
@@ -15,36 +16,6 @@ def load_specific_marker_data(marker_data:np.ndarray, joint_to_use:str, axis_to_
 
     return marker_position_1d, marker_velocity_1d
 
-def detect_zero_crossings(marker_velocity_data:np.ndarray, search_range=2):
-    threshold_to_ignore_next_crossing = 5
-    zero_crossings = np.where(np.diff(np.sign(marker_velocity_data)))[0]
-
-    thresholded_zero_crossings_frames = list(zero_crossings.copy())
-
-    for count,frame in enumerate(thresholded_zero_crossings_frames):
-        frames_to_filter_out = np.array(range(frame+1,frame+threshold_to_ignore_next_crossing))
-        thresholded_zero_crossings_frames = np.setdiff1d(thresholded_zero_crossings_frames,frames_to_filter_out)
-
-    zero_crossings = thresholded_zero_crossings_frames
-
-    heel_strike_frames = []
-    toe_off_frames = []
-
-    #searches around the located zero crossing frames to find the frame that has the lowest velocity within the search range
-    for frame in zero_crossings:
-        start = max(0, frame - search_range)
-        end = min(len(marker_velocity_data) - 1, frame + search_range)
-        min_abs_velocity_index = start + np.argmin(np.abs(marker_velocity_data[start:end+1]))
-
-        #if the velocity is negative at the original detected frame (which is right before the 0 crossing), then it's toe off (slope is positive)
-        if marker_velocity_data[frame] > 0:
-            heel_strike_frames.append(min_abs_velocity_index)
-        else:
-            toe_off_frames.append(min_abs_velocity_index)
-
-    return heel_strike_frames, toe_off_frames
-
-                
 def divide_3d_data_into_steps(marker_position_3d_data: np.ndarray, event_frames: list):
     num_frames, num_markers, num_dimensions = marker_position_3d_data.shape
 
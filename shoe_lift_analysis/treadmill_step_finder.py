@@ -1,6 +1,7 @@
 from pathlib import Path
 import numpy as np
 from freemocap_utils.mediapipe_skeleton_builder import mediapipe_indices
+from shoe_lift_analysis.gait_events import detect_zero_crossings
 import matplotlib.pyplot as plt
 from scipy.interpolate import interp1d
 
@@ -42,39 +43,6 @@ def load_specific_marker_data(marker_data:np.ndarray, joint_to_use:str, axis_to_
 
  #x = 0,y = 1, z = 2
 
-def detect_zero_crossings(marker_velocity_data:np.ndarray, search_range=2, show_plot = False):
-    threshold_to_ignore_next_crossing = 5
-    zero_crossings = np.where(np.diff(np.sign(marker_velocity_data)))[0]
-
-    thresholded_zero_crossings_frames = list(zero_crossings.copy())
-
-    for count,frame in enumerate(thresholded_zero_crossings_frames):
-        frames_to_filter_out = np.array(range(frame+1,frame+threshold_to_ignore_next_crossing))
-        thresholded_zero_crossings_frames = np.setdiff1d(thresholded_zero_crossings_frames,frames_to_filter_out)
-
-    zero_crossings = thresholded_zero_crossings_frames
-
-    heel_strike_frames = []
-    toe_off_frames = []
-
-    #searches around the located zero crossing frames to find the frame that has the lowest velocity within the search range
-    for frame in zero_crossings:
-        start = max(0, frame - search_range)
-        end = min(len(marker_velocity_data) - 1, frame + search_range)
-        min_abs_velocity_index = start + np.argmin(np.abs(marker_velocity_data[start:end+1]))
-
-        #if the velocity is negative at the original detected frame (which is right before the 0 crossing), then it's toe off (slope is positive)
-        if marker_velocity_data[frame] > 0:
-            heel_strike_frames.append(min_abs_velocity_index)
-        else:
-            toe_off_frames.append(min_abs_velocity_index)
-
-        #to account for the np diff removes the first frame
-        # heel_strike_frames_adjusted = [frame + 1 for frame in heel_strike_frames]
-        # toe_off_frames_adjusted = [frame + 1 for frame in toe_off_frames]
-
-    return heel_strike_frames, toe_off_frames
-
 def plot_event_frames(marker_position_data:np.ndarray, marker_velocity_data:np.ndarray, heel_strike_frames, toe_off_frames):
     figure = plt.figure()
     position_ax = figure.add_subplot(211)
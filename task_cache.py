@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+
+DEFAULT_MAX_CACHE_SIZE_BYTES = 10 * 1024**3
+
+
+def hash_array(array: np.ndarray) -> str:
+    """Hash the shape, dtype and contents of an array"""
+    array = np.ascontiguousarray(array)
+    hasher = hashlib.sha256()
+    hasher.update(str(array.shape).encode())
+    hasher.update(str(array.dtype).encode())
+    hasher.update(array.data)
+    return hasher.hexdigest()
+
+
+def _settings_to_json(value):
+    """Converts the non-JSON values that show up in settings (numpy scalars and arrays, paths). Anything else raises,
+    since hashing its str() could give a different key every run (object reprs have memory addresses) or the same key for different settings"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, Path):
+        return str(value)
+    raise TypeError(f'Setting of type {type(value).__name__} can not be hashed, use JSON types, numpy values or paths')
+
+
+def hash_settings(settings) -> str:
+    """Hash a settings dictionary (e.g. skellyforge's default_settings). Keys are sorted so the hash doesn't depend on their order"""
+    settings_json = json.dumps(settings, sort_keys=True, default=_settings_to_json)
+    return hashlib.sha256(settings_json.encode()).hexdigest()
+
+
+def hash_task(task_name: str, input_hash: str, upstream_task_hash: str = '', settings_hash: str = '') -> str:
+    """Combine everything a task result depends on into a single key"""
+    hasher = hashlib.sha256()
+    for part in (task_name, input_hash, upstream_task_hash, settings_hash):
+        hasher.update(part.encode())
+        hasher.update(b'\0')
+    return hasher.hexdigest()
+
+
+class TaskCache:
+    """Stores task results as .npy files named by their task hash. When the folder grows past max_cache_size_bytes,
+    the least recently used results are deleted. A cache hit touches the file, so its modification time is the last use"""
+
+    def __init__(self, path_to_cache_folder: Union[str, Path], max_cache_size_bytes: int = DEFAULT_MAX_CACHE_SIZE_BYTES):
+        self.path_to_cache_folder = Path(path_to_cache_folder)
+        self.max_cache_size_bytes = max_cache_size_bytes
+
+    def get_path(self, task_hash: str) -> Path:
+        return self.path_to_cache_folder/f'{task_hash}.npy'
+
+    def load(self, task_hash: str):
+        """Returns the cached result for this hash, or None if there isn't one"""
+        path_to_result = self.get_path(task_hash)
+        if not path_to_result.exists():
+            return None
+        try:
+            result = np.load(path_to_result)
+        except (OSError, ValueError):
+            # a partially written or corrupted file, so treat it as a miss
+            path_to_result.unlink(missing_ok=True)
+            return None
+        os.utime(path_to_result)
+        return result
+
+    def save(self, task_hash: str, result: np.ndarray):
+        self.path_to_cache_folder.mkdir(parents=True, exist_ok=True)
+        path_to_result = self.get_path(task_hash)
+        # write to a temporary file first so an interrupted save never leaves a half written result behind
+        path_to_temporary_file = path_to_result.with_suffix('.tmp.npy')
+        np.save(path_to_temporary_file, result)
+        os.replace(path_to_temporary_file, path_to_result)
+        self.evict()
+
+    def evict(self):
+        """Delete the least recently used results until the cache fits within max_cache_size_bytes"""
+        cached_files = [(path, path.stat()) for path in self.path_to_cache_folder.glob('*.npy')]
+        total_size = sum(file_stats.st_size for _, file_stats in cached_files)
+        for path, file_stats in sorted(cached_files, key=lambda cached_file: cached_file[1].st_mtime):
+            if total_size <= self.max_cache_size_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= file_stats.st_size
@@ -0,0 +1,82 @@
+from typing import Dict, List
+import numpy as np
+from models.skeleton import Skeleton
+
+
+class CenterOfMassOperator:
+    """
+    The segment and total body center of mass calculations folded into weights on the marker positions.
+
+    Each segment COM is proximal + (distal - proximal) * segment_com_length, which is a weighted sum of two markers,
+    and the total body COM is the sum of the segment COMs weighted by segment_com_percentage. So every COM is a
+    fixed linear combination of markers, and can be calculated for all frames with one matrix multiplication.
+    Only the markers used by some segment are kept, and the operator works on any block of frames, so a recording
+    can be streamed through it in chunks.
+    """
+
+    def __init__(self, segment_names: List[str], used_marker_indices: np.ndarray, segment_com_matrix: np.ndarray, total_body_com_weights: np.ndarray):
+        self.segment_names = segment_names
+        self.used_marker_indices = used_marker_indices
+        self.segment_com_matrix = segment_com_matrix
+        self.total_body_com_weights = total_body_com_weights
+
+    @classmethod
+    def from_segment_marker_indices(
+        cls,
+        segment_names: List[str],
+        proximal_indices: np.ndarray,
+        distal_indices: np.ndarray,
+        anthropometric_data: Dict[str, Dict[str, float]]
+    ) -> 'CenterOfMassOperator':
+        """
+        Builds the operator from the marker column of each segment's proximal and distal marker.
+
+        Parameters:
+        - segment_names: The segments to include, in the same order as the index arrays.
+        - proximal_indices: The marker array column of each segment's proximal marker.
+        - distal_indices: The marker array column of each segment's distal marker.
+        - anthropometric_data: A dictionary containing the COM length and mass percentage for each segment.
+        """
+        used_marker_indices, used_marker_positions = np.unique(np.concatenate([proximal_indices, distal_indices]), return_inverse=True)
+        proximal_positions = used_marker_positions[:len(segment_names)]
+        distal_positions = used_marker_positions[len(segment_names):]
+
+        com_lengths = np.array([anthropometric_data[segment_name].segment_com_length for segment_name in segment_names])
+        mass_percentages = np.array([anthropometric_data[segment_name].segment_com_percentage for segment_name in segment_names])
+
+        segment_rows = np.arange(len(segment_names))
+        segment_com_matrix = np.zeros((len(segment_names), len(used_marker_indices)))
+        np.add.at(segment_com_matrix, (segment_rows, proximal_positions), 1 - com_lengths)
+        np.add.at(segment_com_matrix, (segment_rows, distal_positions), com_lengths)
+
+        total_body_com_weights = mass_percentages @ segment_com_matrix
+
+        return cls(segment_names, used_marker_indices, segment_com_matrix, total_body_com_weights)
+
+    @classmethod
+    def from_skeleton(cls, skeleton: Skeleton) -> 'CenterOfMassOperator':
+        """Builds the operator for every segment in the skeleton's anthropometric data."""
+        segment_names = list(skeleton.anthropometric_data.keys())
+        segment_marker_indices = skeleton.get_segment_marker_indices(segment_names)
+        return cls.from_segment_marker_indices(
+            segment_names=segment_names,
+            proximal_indices=segment_marker_indices['proximal'],
+            distal_indices=segment_marker_indices['distal'],
+            anthropometric_data=skeleton.anthropometric_data
+        )
+
+    def calculate_segment_com(self, marker_array: np.ndarray) -> np.ndarray:
+        """
+        Calculates the (frames, segments, 3) segment COM positions from a (frames, markers, 3) marker array.
+        A segment COM is NaN only where its own proximal or distal marker is missing.
+        """
+        used_marker_positions = marker_array[:, self.used_marker_indices, :]
+        missing_positions = np.isnan(used_marker_positions)
+
+        segment_com = np.matmul(self.segment_com_matrix, np.where(missing_positions, 0, used_marker_positions))
+        segment_com[np.matmul(self.segment_com_matrix != 0, missing_positions)] = np.nan
+        return segment_com
+
+    def calculate_total_body_com(self, marker_array: np.ndarray) -> np.ndarray:
+        """Calculates the (frames, 3) total body COM from a (frames, markers, 3) marker array."""
+        return np.einsum('m,fmd->fd', self.total_body_com_weights, marker_array[:, self.used_marker_indices, :])
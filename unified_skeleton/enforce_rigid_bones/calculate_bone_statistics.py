@@ -1,5 +1,5 @@
 import numpy as np
-from typing import Dict
+from typing import Dict, List
 
 def calculate_bone_lengths_and_statistics(
     marker_data: Dict[str, np.ndarray], 
@@ -42,4 +42,38 @@ def calculate_bone_lengths_and_statistics(
             'stdev': stdev_length  # The standard deviation of the bone lengths
         }
 
-    return bone_statistics
\ No newline at end of file
+    return bone_statistics
+
+
+def calculate_bone_lengths_and_statistics_from_marker_array(
+    marker_array: np.ndarray,
+    segment_names: List[str],
+    proximal_indices: np.ndarray,
+    distal_indices: np.ndarray
+) -> Dict[str, Dict[str, float]]:
+    """
+    Calculates the same bone lengths and statistics as calculate_bone_lengths_and_statistics, for every segment at once.
+
+    Parameters:
+    - marker_array: A (frames, markers, 3) array of marker positions.
+    - segment_names: The names of the segments, in the same order as the index arrays.
+    - proximal_indices: The marker_array column of each segment's proximal marker.
+    - distal_indices: The marker_array column of each segment's distal marker.
+
+    Returns:
+    - A dictionary with segment names as keys and dictionaries with lengths, median lengths,
+      and standard deviations as values.
+    """
+    # (frames, segments) bone lengths, NaN wherever either marker is missing
+    lengths = np.linalg.norm(marker_array[:, distal_indices, :] - marker_array[:, proximal_indices, :], axis=2)
+    median_lengths = np.nanmedian(lengths, axis=0)
+    stdev_lengths = np.nanstd(lengths, axis=0)
+
+    return {
+        segment_name: {
+            'lengths': lengths[:, i],
+            'median': median_lengths[i],
+            'stdev': stdev_lengths[i]
+        }
+        for i, segment_name in enumerate(segment_names)
+    }
@@ -1,16 +1,17 @@
 from typing import Dict, List
 import numpy as np
-from copy import deepcopy
 
 def enforce_rigid_bones(
-    marker_data: Dict[str, np.ndarray], 
-    segment_connections: Dict[str, Dict[str, str]], 
-    bone_lengths_and_statistics: Dict[str, Dict[str, float]], 
+    marker_data: Dict[str, np.ndarray],
+    segment_connections: Dict[str, Dict[str, str]],
+    bone_lengths_and_statistics: Dict[str, Dict[str, float]],
     joint_hierarchy: Dict[str, List[str]]
 ) -> Dict[str, np.ndarray]:
     """
     Enforces rigid bones by adjusting the distal joints of each segment to match the median length.
-    
+    Each segment is adjusted for all frames at once, and the adjustment is passed down to every
+    descendant of the distal joint using a precomputed order of the joint hierarchy.
+
     Parameters:
     - marker_data: The original marker positions.
     - segment_connections: Information about how segments (bones) are connected.
@@ -20,40 +21,59 @@ def enforce_rigid_bones(
     Returns:
     - A dictionary of adjusted marker positions.
     """
-    rigid_marker_data = deepcopy(marker_data)
+    rigid_marker_data = {marker_name: np.copy(positions) for marker_name, positions in marker_data.items()}
+    descendants = get_joint_descendants(joint_hierarchy)
 
     for segment_name, stats in bone_lengths_and_statistics.items():
         desired_length = stats['median']
-        lengths = stats['lengths']
-        
+        lengths = np.asarray(stats['lengths'])
+
         segment = segment_connections[segment_name]
         proximal_marker, distal_marker = segment.proximal, segment.distal
-        
-        for frame_index, current_length in enumerate(lengths):
-            if current_length != desired_length:
-                proximal_position = marker_data[proximal_marker][frame_index]
-                distal_position = marker_data[distal_marker][frame_index]
-                direction = distal_position - proximal_position
-                direction /= np.linalg.norm(direction)  # Normalize to unit vector
-                adjustment = (desired_length - current_length) * direction
-                
-                rigid_marker_data[distal_marker][frame_index] += adjustment
-                
-                adjust_children(distal_marker, frame_index, adjustment, rigid_marker_data, joint_hierarchy)
-    
+
+        direction = marker_data[distal_marker] - marker_data[proximal_marker]
+        direction /= np.linalg.norm(direction, axis=1, keepdims=True)  # Normalize to unit vectors
+        adjustment = (desired_length - lengths)[:, np.newaxis] * direction
+        # frames that are already at the desired length are left untouched
+        adjustment[lengths == desired_length] = 0
+
+        rigid_marker_data[distal_marker] += adjustment
+        for child_marker in descendants.get(distal_marker, []):
+            rigid_marker_data[child_marker] += adjustment
+
     return rigid_marker_data
 
-def adjust_children(
-    parent_marker: str, 
-    frame_index: int, 
-    adjustment: np.ndarray, 
-    marker_data: Dict[str, np.ndarray], 
-    joint_hierarchy: Dict[str, List[str]]
-):
+def get_joint_descendants(joint_hierarchy: Dict[str, List[str]]) -> Dict[str, List[str]]:
     """
-    Recursively adjusts the positions of child markers based on the adjustment of the parent marker.
+    Builds a list of every marker below each joint in the hierarchy, in the same depth-first order
+    that the adjustments are passed down in. Joints are processed in reverse topological order so
+    each joint's list is built from the already finished lists of its children.
+    A marker reachable through more than one path is listed once per path.
     """
-    if parent_marker in joint_hierarchy:
-        for child_marker in joint_hierarchy[parent_marker]:
-            marker_data[child_marker][frame_index] += adjustment
-            adjust_children(child_marker, frame_index, adjustment, marker_data, joint_hierarchy)
+    children_of = {joint: list(children) for joint, children in joint_hierarchy.items()}
+
+    # Kahn's algorithm, starting from joints that no other joint lists as a child
+    num_parents = {joint: 0 for joint in children_of}
+    for children in children_of.values():
+        for child in children:
+            if child in num_parents:
+                num_parents[child] += 1
+    topological_order = [joint for joint, count in num_parents.items() if count == 0]
+    for joint in topological_order:
+        for child in children_of[joint]:
+            if child in num_parents:
+                num_parents[child] -= 1
+                if num_parents[child] == 0:
+                    topological_order.append(child)
+
+    if len(topological_order) != len(children_of):
+        raise ValueError('The joint hierarchy contains a cycle.')
+
+    descendants = {}
+    for joint in reversed(topological_order):
+        descendants[joint] = []
+        for child in children_of[joint]:
+            descendants[joint].append(child)
+            descendants[joint].extend(descendants.get(child, []))
+
+    return descendants
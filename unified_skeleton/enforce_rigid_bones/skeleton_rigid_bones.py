@@ -3,20 +3,24 @@ from models.joint_hierarchy import JointHierarchy
 from typing import Dict, List
 
 from .enforce_rigid_bones import enforce_rigid_bones
-from .calculate_bone_statistics import calculate_bone_lengths_and_statistics
+from .calculate_bone_statistics import calculate_bone_lengths_and_statistics_from_marker_array
 
 def enforce_rigid_bones_from_skeleton(skeleton:Skeleton):
 
-    bone_lengths_and_statistcs = calculate_bone_lengths_and_statistics(
-        marker_data=skeleton.marker_data, 
-        segment_connections=skeleton.segments
-    )
+    segment_names = list(skeleton.segments.keys())
+    segment_marker_indices = skeleton.get_segment_marker_indices(segment_names)
 
+    bone_lengths_and_statistics = calculate_bone_lengths_and_statistics_from_marker_array(
+        marker_array=skeleton.marker_array,
+        segment_names=segment_names,
+        proximal_indices=segment_marker_indices['proximal'],
+        distal_indices=segment_marker_indices['distal']
+    )
 
     rigid_marker_data = enforce_rigid_bones(
         marker_data=skeleton.marker_data, 
         segment_connections=skeleton.segments, 
-        bone_lengths_and_statistics=bone_lengths_and_statistcs, 
+        bone_lengths_and_statistics=bone_lengths_and_statistics, 
         joint_hierarchy=skeleton.joint_hierarchy
     )
 
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, root_validator, Field
 from typing import Dict, List, Optional
+import numpy as np
 
 from .markers import Markers
 from .virtual_markers import VirtualMarkers
@@ -9,6 +10,10 @@ class MarkerHub(BaseModel):
     original_marker_names: Markers
     virtual_markers: Optional[VirtualMarkers] = None
     _all_markers: List[str] = Field(default_factory=list)
+    virtual_marker_weights: Optional[np.ndarray] = None
+
+    class Config:
+        arbitrary_types_allowed = True
 
     @root_validator
     def copy_markers_to_all(cls, values):
@@ -26,6 +31,25 @@ class MarkerHub(BaseModel):
         for virtual_marker_name in virtual_markers_model.virtual_markers.keys():
             if virtual_marker_name not in self._all_markers:
                 self._all_markers.append(virtual_marker_name)
+        self.virtual_marker_weights = self.compile_virtual_marker_weights()
+
+    def compile_virtual_marker_weights(self) -> np.ndarray:
+        """
+        Compile the virtual marker definitions into a (virtual markers, original markers) weight matrix,
+        so every virtual marker can be calculated with a single matrix multiplication.
+        Rows are in the order of the virtual marker definitions, columns in the order of the original markers.
+        """
+        original_marker_names = self.original_marker_names.markers
+        marker_to_index = {marker_name: i for i, marker_name in enumerate(original_marker_names)}
+        virtual_markers = self.virtual_markers.virtual_markers
+
+        weight_matrix = np.zeros((len(virtual_markers), len(original_marker_names)))
+        for vm_index, (vm_name, vm_info) in enumerate(virtual_markers.items()):
+            for marker_name, weight in zip(vm_info['marker_names'], vm_info['marker_weights']):
+                if marker_name not in marker_to_index:
+                    raise ValueError(f'The marker {marker_name} used by the virtual marker {vm_name} is not in the list of original markers.')
+                weight_matrix[vm_index, marker_to_index[marker_name]] += weight
+        return weight_matrix
 
     @property
     def all_markers(self) -> List[str]:
@@ -12,6 +12,8 @@ class Skeleton(BaseModel):
     markers: MarkerHub
     segments: Optional[Dict[str, Dict[str, str]]] = None
     marker_data: Dict[str, np.ndarray] = {}  
+    marker_array: Optional[np.ndarray] = None
+    marker_index: Dict[str, int] = {}
     virtual_marker_data: Dict[str, np.ndarray] = {}
     joint_hierarchy: Optional[Dict[str, List[str]]] = None
     anthropometric_data: Optional[Dict[str, Dict[str, float]]] = None
@@ -65,23 +67,77 @@ class Skeleton(BaseModel):
         #         f"the number of markers in the model ({num_markers_in_model})."
         #     )
     
-        for i, marker_name in enumerate(original_marker_names_list):
-            self.marker_data[marker_name] = freemocap_3d_data[:, i, :]
+        num_virtual_markers = 0 if self.markers.virtual_markers is None else len(self.markers.virtual_markers.virtual_markers)
+
+        # One (frames, original + virtual markers, 3) buffer holds everything, and marker_data is a set of views into it
+        self.marker_array = np.empty((freemocap_3d_data.shape[0], num_markers_in_model + num_virtual_markers, 3))
+        self.marker_array[:, :num_markers_in_model, :] = freemocap_3d_data[:, :num_markers_in_model, :]
+        self.marker_array[:, num_markers_in_model:, :] = np.nan
+
+        self.marker_index = {marker_name: i for i, marker_name in enumerate(original_marker_names_list)}
+        self.marker_data = {marker_name: self.marker_array[:, i, :] for marker_name, i in self.marker_index.items()}
+        self.virtual_marker_data = {}
 
     def calculate_virtual_markers(self):
         # Check if actual marker data is present
         if not self.marker_data:
             raise ValueError("3d marker data must be integrated before calculating virtual markers. Run `integrate_freemocap_3d_data()` first.")
 
-        # Iterate over the virtual markers and calculate their positions
-        for vm_name, vm_info in self.markers.virtual_markers.virtual_markers.items():
-            # Initialize an array to hold the computed positions of the virtual marker
-            vm_positions = np.zeros((self.marker_data[next(iter(self.marker_data))].shape[0], 3))
-            for marker_name, weight in zip(vm_info['marker_names'], vm_info['marker_weights']):
-                vm_positions += self.marker_data[marker_name] * weight
-            self.virtual_marker_data[vm_name] = vm_positions
-        
+        num_original_markers = len(self.markers.original_marker_names.markers)
+        original_marker_positions = self.marker_array[:, :num_original_markers, :]
+        virtual_marker_weights = self.markers.virtual_marker_weights
+
+        # All virtual markers at once: (virtual, original) @ (frames, original, 3) -> (frames, virtual, 3)
+        missing_positions = np.isnan(original_marker_positions)
+        virtual_marker_positions = np.matmul(virtual_marker_weights, np.where(missing_positions, 0, original_marker_positions))
+        # A virtual marker is missing wherever one of the markers it is built from is missing
+        virtual_marker_positions[np.matmul(virtual_marker_weights != 0, missing_positions)] = np.nan
+        self.marker_array[:, num_original_markers:, :] = virtual_marker_positions
+
+        for i, vm_name in enumerate(self.markers.virtual_markers.virtual_markers):
+            self.marker_index[vm_name] = num_original_markers + i
+        self.virtual_marker_data = {
+            vm_name: self.marker_array[:, self.marker_index[vm_name], :]
+            for vm_name in self.markers.virtual_markers.virtual_markers
+        }
         self.marker_data.update(self.virtual_marker_data)
+
+    def get_marker_indices(self, marker_names: List[str]) -> np.ndarray:
+        """Returns the column of each marker in marker_array, for indexing many markers at once."""
+        missing_markers = [marker_name for marker_name in marker_names if marker_name not in self.marker_index]
+        if missing_markers:
+            raise ValueError(f"Markers {missing_markers} have no data in the skeleton. Integrate the 3d data (and calculate virtual markers) first.")
+        return np.array([self.marker_index[marker_name] for marker_name in marker_names], dtype=np.intp)
+
+    def get_segment_marker_indices(self, segment_names: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Returns the marker_array columns of the proximal and distal markers of each segment.
+
+        Parameters:
+        - segment_names: Optional; the segments to look up, in order. Defaults to every segment in the skeleton.
+
+        Returns:
+        - A dictionary with 'proximal' and 'distal' keys, each an index array with one entry per segment.
+        """
+        if segment_names is None:
+            segment_names = list(self.segments.keys())
+
+        undefined_segments = [segment_name for segment_name in segment_names if segment_name not in self.segments]
+        if undefined_segments:
+            raise ValueError(f"Segments {undefined_segments} are not defined in the skeleton.")
+
+        return {
+            'proximal': self.get_marker_indices([self.segments[segment_name].proximal for segment_name in segment_names]),
+            'distal': self.get_marker_indices([self.segments[segment_name].distal for segment_name in segment_names])
+        }
+
+    def get_segment_marker_positions(self, segment_names: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """Returns a dictionary with the (frames, segments, 3) positions of the proximal and distal markers of each segment."""
+        segment_marker_indices = self.get_segment_marker_indices(segment_names)
+        return {
+            'proximal': self.marker_array[:, segment_marker_indices['proximal'], :],
+            'distal': self.marker_array[:, segment_marker_indices['distal'], :]
+        }
     
     def get_segment_markers(self, segment_name: str) -> Dict[str, np.ndarray]:
         """Returns a dictionary with the positions of the proximal and distal markers for a segment."""